@@ -92,15 +92,19 @@
             and running time since last TM
  2.07 JFC - Ignore current readings from channels that are OFF
 """
+import calendar
 import configparser
+import locale
 import os
-import shutil
-import socket
-from collections import OrderedDict
+import threading
+from array import array
+from itertools import compress
+from queue import SimpleQueue, Queue, Empty, Full
 import time
+from time import monotonic
 from datetime import datetime, timezone
 import PySimpleGUI as sg
-from socket import *
+from socket import socket, AF_INET, SOCK_DGRAM, SHUT_RDWR
 
 # ========================================== #
 # Make sure to update this VERSION_STRING!   #
@@ -111,6 +115,14 @@ DEBUG = False                                # Set to false in operation
 CONFIG_FILE = "settings.ini"                # Path of config file
 CONFIG_FILE_BACKUP = "settings.ini.backup"  # Just in case...
 USER_CONTROL = "userControl.ini"
+READ_TIMEOUT_MIN_MS = 10                    # Bounds of the main loop wait for GUI events. The upper
+READ_TIMEOUT_MAX_MS = 250                   # one keeps the clock and status display running
+AUTO_REFRESH_MIN_S = READ_TIMEOUT_MAX_MS / 1000.0   # Shortest AUTO-REFRESH period (i.e. when set to 0)
+TM_DRAIN_MAX = 32                           # Max number of queued TM packets processed per loop iteration
+TM_QUEUE_MAX = 1024                         # Max number of TM packets waiting for the GUI thread (oldest dropped)
+LOG_FLUSH_PERIOD_S = 0.5                    # Log file is flushed at least that often while lines are written...
+LOG_FLUSH_BYTES = 65536                     # ...or as soon as that much is waiting to be written (buffer size)
+LOG_WRITE_BATCH_MAX = 256                   # Max number of queued log lines written in one go
 # timestamp = time.strftime("%Y%m%d_%H%M%S")  # timestamp
 # LOG_FILE = timestamp + ".txt"  # log filename = YearMonthDay_HourMinuteSecond
 
@@ -122,10 +134,28 @@ _S5_ = 4
 _S6_ = 5
 _HEATERS_ = 6
 
+SERVICE_KEYS = tuple(f'service{i+1}' for i in range(_S1_, _S6_ + 1))      # Service index ==> name in [services]
+_COLOR_ON = ('white', 'green')              # Service button colors (text, background)
+_COLOR_OFF = ('white', 'firebrick3')
+SERVICE_INDEX_BAD = -1                      # Returned by service_index for an id that is not a number...
+SERVICE_INDEX_OUT_OF_RANGE = -2             # ...or a number that is not a valid service
+GROUP_SETTINGS_KEYS = tuple((f'service{i}_group{g}', f'-S{i}GR{g}-') for i in range(1, 7) for g in (1, 2))  # [services] key, checkbox key
+TOGGLE_EVENTS = {f'-S{i+1}TOGGLE-': i for i in range(_S1_, _S6_ + 1)}     # Event key ==> service index
+REFRESH_EVENTS = {f'-S{i+1}REFRESH-': i for i in range(_S1_, _S6_ + 1)}   # Event key ==> service index
+
+# ----------------------------------------------------------------- #
+# Commands sent at each REFRESH ALL, as (text, datagram) pairs. The #
+# datagrams never change, so they are encoded only once, here.      #
+# ----------------------------------------------------------------- #
+REFRESH_ALL_COMMANDS = tuple((f"STATUS,{i}", f"STATUS,{i}".encode()) for i in range(1, 7))
+
 global time_last_packet_received
+global tm_packets_dropped                   # Count of TM packets dropped because the GUI thread fell behind
 global use_batteries
 global battery
 global window
+global widgets                              # Global dictionary of the widgets updated at run time, by key
+global last_shown                           # Global dictionary of what is currently displayed by some widgets (see update_if_changed)
 global log                                  # Glogal custom log object (a simple one we define in this file)
 global output                               # Global dictionary to keep data & state about each output
 global group1, group2                       # Global dictionary to keep data & state about each group of outputs
@@ -186,14 +216,15 @@ def make_window(theme, profiles, settings, services, devices):
     status_frame = sg.Frame('Status', status_layout)
 
     outputctrl_layout = [
-        [sg.Text('SERVICE (Press to toggle)', size=(40, 1), justification='center'), sg.Button('Amp.', key='-REFRESHALL-', size=(6, 1)), sg.Text('Gr1'), sg.Text('Gr2')],
-        [sg.Button(get_service_text_status(_S1_, services), key='-S1TOGGLE-', size=(40, 1)), sg.Button('0.000', key='-S1REFRESH-', size=(6, 1)), sg.Checkbox('', key='-S1GR1-', enable_events=True), sg.Checkbox('', key='-S1GR2-', enable_events=True)],
-        [sg.Button(get_service_text_status(_S2_, services), key='-S2TOGGLE-', size=(40, 1)), sg.Button('0.000', key='-S2REFRESH-', size=(6, 1)), sg.Checkbox('', key='-S2GR1-', enable_events=True), sg.Checkbox('', key='-S2GR2-', enable_events=True)],
-        [sg.Button(get_service_text_status(_S3_, services), key='-S3TOGGLE-', size=(40, 1)), sg.Button('0.000', key='-S3REFRESH-', size=(6, 1)), sg.Checkbox('', key='-S3GR1-', enable_events=True), sg.Checkbox('', key='-S3GR2-', enable_events=True)],
-        [sg.Button(get_service_text_status(_S4_, services), key='-S4TOGGLE-', size=(40, 1)), sg.Button('0.000', key='-S4REFRESH-', size=(6, 1)), sg.Checkbox('', key='-S4GR1-', enable_events=True), sg.Checkbox('', key='-S4GR2-', enable_events=True)],
-        [sg.Button(get_service_text_status(_S5_, services), key='-S5TOGGLE-', size=(40, 1)), sg.Button('0.000', key='-S5REFRESH-', size=(6, 1)), sg.Checkbox('', key='-S5GR1-', enable_events=True), sg.Checkbox('', key='-S5GR2-', enable_events=True)],
-        [sg.Button(get_service_text_status(_S6_, services), key='-S6TOGGLE-', size=(40, 1)), sg.Button('0.000', key='-S6REFRESH-', size=(6, 1)), sg.Checkbox('', key='-S6GR1-', enable_events=True), sg.Checkbox('', key='-S6GR2-', enable_events=True)]
+        [sg.Text('SERVICE (Press to toggle)', size=(40, 1), justification='center'), sg.Button('Amp.', key='-REFRESHALL-', size=(6, 1)), sg.Text('Gr1'), sg.Text('Gr2')]
     ]
+    for service in range(_S1_, _S6_ + 1):    # One row per service, keys are -S1TOGGLE-, -S1REFRESH-, -S1GR1-, etc.
+        outputctrl_layout.append([
+            sg.Button(get_service_text_status(service, services), key=f'-S{service+1}TOGGLE-', size=(40, 1)),
+            sg.Button('0.000', key=f'-S{service+1}REFRESH-', size=(6, 1)),
+            sg.Checkbox('', key=f'-S{service+1}GR1-', enable_events=True),
+            sg.Checkbox('', key=f'-S{service+1}GR2-', enable_events=True)
+        ])
     outputctrl_frame = sg.Frame('Output Control', outputctrl_layout)
 
     pwrusage_layout = [
@@ -244,18 +275,24 @@ def make_window(theme, profiles, settings, services, devices):
     new_window = sg.Window('STRATOS PDU Service Control '+VERSION_STRING, layout)
     new_window.finalize()  # Needed so that we can immediately update widget states
 
-    new_window['-S1GR1-'].update(services['service1_group1'] == 'True')
-    new_window['-S1GR2-'].update(services['service1_group2'] == 'True')
-    new_window['-S2GR1-'].update(services['service2_group1'] == 'True')
-    new_window['-S2GR2-'].update(services['service2_group2'] == 'True')
-    new_window['-S3GR1-'].update(services['service3_group1'] == 'True')
-    new_window['-S3GR2-'].update(services['service3_group2'] == 'True')
-    new_window['-S4GR1-'].update(services['service4_group1'] == 'True')
-    new_window['-S4GR2-'].update(services['service4_group2'] == 'True')
-    new_window['-S5GR1-'].update(services['service5_group1'] == 'True')
-    new_window['-S5GR2-'].update(services['service5_group2'] == 'True')
-    new_window['-S6GR1-'].update(services['service6_group1'] == 'True')
-    new_window['-S6GR2-'].update(services['service6_group2'] == 'True')
+    # -------------------------------------------------------------- #
+    # Keep a reference on the widgets that are updated at run time,  #
+    # so that we do not have to look them up by key at every update. #
+    # -------------------------------------------------------------- #
+    global widgets, last_shown
+    widgets = {}
+    last_shown = {}
+    for key in ('-CURRENT_TIME-', '-STATUS-', '-TIME_SINCE_PDU-', '-HEATERS_WH-', '-LOG_FILE-', '-ON_BATTERIES_TOGGLE-', '-TMTCLOG-',
+                '-GR1_A-', '-GR1_WH-', '-GR1_LIMIT_WH-', '-GR2_A-', '-GR2_WH-', '-GR2_LIMIT_WH-',
+                '-HEATERS_A-', '-TOTAL_A-', '-TOTAL_WH-', '-BATTERY_WH-', '-BATTERY_PERCENT-', '-BATTERY_PROGRESS-'):
+        widgets[key] = new_window[key]
+    for i in range(1, 7):
+        for key in (f'-S{i}TOGGLE-', f'-S{i}REFRESH-', f'-S{i}GR1-', f'-S{i}GR2-'):
+            widgets[key] = new_window[key]
+
+    for i in range(1, 7):
+        for g in (1, 2):
+            widgets[f'-S{i}GR{g}-'].update(services[f'service{i}_group{g}'] == 'True')
 
     return new_window
 
@@ -326,7 +363,7 @@ def log_file_exists_popup(filename):
 def main():
     """ Main entry point
     """
-    global window, log, use_batteries, battery, time_last_packet_received
+    global window, log, use_batteries, battery, time_last_packet_received, tm_packets_dropped
     global output, group1, group2  # output_current_accumulated_group1, output_current_accumulated_group2
 
     # --------------------------------------------- #
@@ -337,10 +374,14 @@ def main():
     time_last_packet_received = 0.0     # This will be a timestamp
 
     battery = {'nominal_voltage': 28.0, 'heaters_consumption': 0.9, 'max_wh': 3750, 'progress_wh': 3750, 'progress_percent': 100}
-    output = {'current': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-              'last_update_time': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],  # Note: 7th item is for heater's last update
+    # ---------------------------------------------------------- #
+    # Numerical values are kept in arrays of C doubles, which are #
+    # stored contiguously instead of as a list of float objects. #
+    # ---------------------------------------------------------- #
+    output = {'current': array('d', [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]),
+              'last_update_time': array('d', [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]),  # Note: 7th item is for heater's last update
               # 'A': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-              'accumulated_Wh': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],    # Note: 7th item is for heater's accumulated Wh
+              'accumulated_Wh': array('d', [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]),    # Note: 7th item is for heater's accumulated Wh
               'is_on': [False, False, False, False, False, False]
               }
     group1 = {'A': 0.0, 'Wh': 0.0, 'limit_Wh': 0.0}
@@ -354,10 +395,20 @@ def main():
     profiles = read_users(USER_CONTROL)
 
     # TODO: Validate settings before populating battery dictionary!!
-    battery['nominal_voltage'] = settings['nominal_voltage']
-    battery['heaters_consumption'] = settings['heaters_consumption']
-    battery['max_wh'] = settings['total_battery_power']
-    battery['progress_wh'] = settings['total_battery_power']
+    # NOTE: Numerical values are converted only once, here. They cannot
+    # be changed from the GUI, so they never have to be converted again.
+    battery['nominal_voltage'] = float(settings['nominal_voltage'])
+    battery['heaters_consumption'] = float(settings['heaters_consumption'])
+    battery['wh_per_amp_second'] = battery['nominal_voltage'] / 3600.0  # Energy for 1A during 1s
+    battery['max_wh'] = float(settings['total_battery_power'])
+    battery['progress_wh'] = battery['max_wh']
+
+    # ------------------------------------------------------ #
+    # Group membership of each service, parsed only once. It #
+    # is then kept in sync with the Gr1/Gr2 checkboxes.      #
+    # ------------------------------------------------------ #
+    group1['members'] = [services[f'service{i}_group1'] == 'True' for i in range(1, 7)]
+    group2['members'] = [services[f'service{i}_group2'] == 'True' for i in range(1, 7)]
 
     # ------------------------------------------------------------#
     # Creates the main window, with the default PySimpleGUI theme #
@@ -368,12 +419,12 @@ def main():
     # Instantiate our simple custom logger #
     # ------------------------------------ #
     log = Logger()
-    window['-LOG_FILE-'].update(settings['log_file'])
+    widgets['-LOG_FILE-'].update(settings['log_file'])
     is_selected_new = True
     while is_selected_new:
         event, values = window.read(timeout=1)  # ms
         is_selected_new, filename = log.set_filename(values['-LOG_FILE-'])
-        window['-LOG_FILE-'].update(filename)
+        widgets['-LOG_FILE-'].update(filename)
     settings['log_file'] = filename
     log.event("STARTING PDU CONTROLLER GUI "+VERSION_STRING)
 
@@ -386,32 +437,57 @@ def main():
     # ========================================================= #
     # Setup the network (Ethernet socket for exchanging packets #
     # with the device)                                          #
-    # NOTE: There is no sock.bind(ipadd,port) defined here, I   #
-    # assume this works because the socket will bind automati-  #
-    # cally to whatever address will be used to SEND, such that #
-    # the same PORT will be used for listening. TBC.            #
+    # NOTE: When not in dual port, the socket is bound to any   #
+    # free port, which is what the first SEND would do anyway:  #
+    # the PDU replies to the port we send from. It has to be    #
+    # bound before the receive thread starts, since Windows     #
+    # refuses to receive on an unbound socket.                  #
     # ========================================================= #
     sock = socket(AF_INET, SOCK_DGRAM)
-    sock.settimeout(0.01)                   # Timeout of 10ms
     if settings['is_dual_port'] == 'True':
         print("Setting receive port. If this causes an error, set is_dual_port to False in settings.ini")
         sock.bind((settings['ip'], int(settings['recv_port'])))
-    # sock.setblocking(False)   Seems we do not need this, rely on timeout
+    else:
+        sock.bind(('', 0))
+    # ------------------------------------------------------ #
+    # The socket is read by its own thread, which blocks on  #
+    # it and queues the packets for this (GUI) thread. This  #
+    # way telemetry is not delayed by the GUI loop cadence.  #
+    # ------------------------------------------------------ #
+    tm_packets_dropped = 0
+    tm_packets_dropped_reported = 0
+    telemetry_queue = Queue(TM_QUEUE_MAX)
+    threading.Thread(target=receive_telemetry, args=(sock, telemetry_queue), daemon=True).start()
 
     # ---------------------------------------------------- #
     # This is the main loop where the events are processed #
     # Note that "window" will return events when they come #
-    # but if there are none "window" will block 100ms.     #
-    # Then, we'll peek on the Ethernet socket to see if we #
-    # have a datagram packet coming in. The socket timeout #
-    # value is set to 10ms. Note that it could probably be #
-    # set as low as 1ms with no problem, since it will not #
-    # be called at more than 10Hz.                         #
+    # but if there are none "window" will block until the  #
+    # next AUTO-REFRESH is due, within READ_TIMEOUT_MIN_MS #
+    # and READ_TIMEOUT_MAX_MS. The receive thread wakes us #
+    # up with a '-TM_RECEIVED-' event when telemetry is    #
+    # queued. At each iteration, we process what is in the #
+    # telemetry queue before handling the event itself.    #
     # ---------------------------------------------------- #
-    start = datetime.utcnow().timestamp()  # fraction of seconds since 1970
+    # ------------------------------------------------------- #
+    # Validated snapshot of the network and refresh settings. #
+    # It is only re-derived by the corresponding GUI events   #
+    # (see on_ip_address, on_tx_port and on_auto_refresh).    #
+    # ------------------------------------------------------- #
+    cached_cfg = {'ip': settings['ip'], 'port': int(settings['dest_port'])}
+    cached_cfg['destination'] = (cached_cfg['ip'], cached_cfg['port'])
+    cached_cfg['refresh_s'] = get_refresh_period_s(settings['refresh_status'])
+    start = monotonic()             # Only used for AUTO-REFRESH delays, no need for wall clock
     is_first_refresh_done = False
+    telemetry_dirty = False         # True when parsed telemetry is not yet shown on the GUI
+    last_shown_time_str = ''        # UTC clock as currently displayed, updated once per second
     while True:
-        event, values = window.read(timeout=100)  # ms
+        if cached_cfg['refresh_s'] is None:
+            read_timeout_ms = READ_TIMEOUT_MAX_MS
+        else:
+            time_to_refresh_ms = int((start + cached_cfg['refresh_s'] - monotonic()) * 1000)
+            read_timeout_ms = max(READ_TIMEOUT_MIN_MS, min(READ_TIMEOUT_MAX_MS, time_to_refresh_ms))
+        event, values = window.read(timeout=read_timeout_ms)
         if not is_first_refresh_done:
             refresh_telemetry_stats_on_gui(services, values)
             is_first_refresh_done = True
@@ -426,196 +502,108 @@ def main():
             print("Clicked Exit!")
             break
 
-        # ----------------------------------------- #
-        # Regenerate those at every iteration, just #
-        # in case they changed at some point.       #
-        # ----------------------------------------- #
-        ip = values['-IPADDRESS-']
-        if values['-TXPORT-'].isdigit():
-            port = int(values['-TXPORT-'])
-        destination = (ip, port)
-        # ------------------------------------------------ #
-        # Then see which event was triggered (if there was #
-        # one), and proceed with what we need to do.       #
-        # ------------------------------------------------ #
-        # ..................................................................... This executes when no event
-        if event == sg.TIMEOUT_EVENT:
+        # -------------------------------------------------------- #
+        # Process the telemetry packets from the PDU queued by the #
+        # receive thread. The GUI is refreshed only once for all   #
+        # of them.                                                 #
+        # -------------------------------------------------------- #
+        for _ in range(TM_DRAIN_MAX):
+            try:
+                data = telemetry_queue.get_nowait()
+            except Empty:
+                break
             # --------------------------------------------------- #
-            # First we check for expiration of AUTO-REFRESH delay #
+            # The logger will add the standard header, so this is #
+            # what we take to parse the telemetry (since we need  #
+            # the timestamp, which is not provided by the PDU.    #
+            # The time of reception is given along, so it does    #
+            # not have to be parsed back from the header.         #
             # --------------------------------------------------- #
-            delay_sec = int(datetime.utcnow().timestamp() - start)
-            auto_refresh_timer = values['-AUTOREFRESH-']
-            if auto_refresh_timer.isdigit():
-                if delay_sec >= int(values['-AUTOREFRESH-']):
-                    send_refresh_all(sock, profiles, settings, destination)
-                    start = datetime.utcnow().timestamp()     # restart the timer delay
-                    # ----------------------------------------- #
-                    # Take the opportunity to verify if heaters #
-                    # accumulated some power consumption.       #
-                    # ----------------------------------------- #
-                    if use_batteries:
-                        if float(output['last_update_time'][_HEATERS_]) > 0.0:
-                            delta = datetime.utcnow().timestamp() - output['last_update_time'][_HEATERS_]
-                            if float(delta) > 0.0:
-                                output['accumulated_Wh'][_HEATERS_] += (float(battery['heaters_consumption']) * (delta / 3600.0) * float(battery['nominal_voltage']))
-                        output['last_update_time'][_HEATERS_] = datetime.utcnow().timestamp()
-                    window['-HEATERS_WH-'].update(f"{output['accumulated_Wh'][_HEATERS_]:.3f}")
-            # -------------------------------------------------------- #
-            # Now we look at the network to see if we have a telemetry #
-            # packet from the PDU to process.                          #
-            # -------------------------------------------------------- #
             try:
-                data, address = sock.recvfrom(2048)    # Will not block, timeout = 10ms
-                # --------------------------------------------------- #
-                # The logger will add the standard header, so this is #
-                # what we take to parse the telemetry (since we need  #
-                # the timestamp, which is not provided by the PDU.    #
-                # --------------------------------------------------- #
-                full_packet = log.rx(data.decode())
+                time_of_reception = time.time()
+                full_packet = log.rx(data.decode('ascii'), time_now=time_of_reception)
                 print(full_packet)
-                parse_telemetry(full_packet, is_save_to_log_file=True)
-                refresh_telemetry_stats_on_gui(services, values)
-            except:
-                pass
-            # ---------------------------------------- #
-            # Update running time clock UTC and status #
-            # ---------------------------------------- #
-            window['-CURRENT_TIME-'].update(datetime.utcnow().isoformat(sep=' ', timespec='seconds'))
-            if use_batteries:
-                window['-STATUS-'].update('USING BATTERIES', text_color='white', background_color='green')
-            else:
-                window['-STATUS-'].update('USING POWER SUPPLY', text_color='white', background_color='red')
-            if time_last_packet_received <= 0.0:
-                window['-TIME_SINCE_PDU-'].update('n/a')
-            else:
-                delta = datetime.utcnow().timestamp() - time_last_packet_received
-                if delta > 0.0:
-                    window['-TIME_SINCE_PDU-'].update(f"{int(delta)}")
-                else:
-                    window['-TIME_SINCE_PDU-'].update('Error')
-        # ..................................................................... ABOUT
-        elif event == 'About':
-            sg.popup('An application to control the CSA STRATOS Power Distribution Unit',
-                     'VERSION: '+VERSION_STRING,
-                     '(C) Canadian Space Agency 2021')
-        # ..................................................................... SET LOG FILE
-        elif event == '-LOG_FILE_SET-':
-            proposed_filename = time.strftime("%Y%m%d_%H%M%S") + "-PDU LOG.txt"
-            is_cancel, log_filename = log_file_set_popup(proposed_filename)
-            if not is_cancel:
-                log.set_filename(log_filename)
-                window['-LOG_FILE-'].update(log_filename)
-                settings['log_file'] = log_filename
-        # ..................................................................... FLIGHT TOGGLE
-        elif event == '-ON_BATTERIES_TOGGLE-':
-            if use_batteries:               # There must be a way just to toggle...
-                use_batteries = False
-                output['last_update_time'][_HEATERS_] = datetime.utcnow().timestamp()
-                log.event("END_USE_BATTERIES", is_save_to_log_file=True)     #NOTE: DO NOT CHANGE, "END_USE_BATTERIES" is a keyword
-                window['-ON_BATTERIES_TOGGLE-'].update('USE BATTERIES')
-            else:
-                use_batteries = True
-                log.event("START_USE_BATTERIES", is_save_to_log_file=True)  # NOTE: DO NOT CHANGE, "START_USE_BATTERIES" is a keyword
-                window['-ON_BATTERIES_TOGGLE-'].update('USE POWER SUPPLY')
-        # ..................................................................... CHANGED DEVICE
-        # elif event == '-DEVICE-':
-        #     log.debug("Clicked Device Button to select: "+values['-DEVICE-'])
-        #     settings['device'] = values['-DEVICE-']
-        # ..................................................................... CHANGED IP ADDRESS
-        elif event == '-IPADDRESS-':
-            log.debug("[GROUND] Changed IP Address to: "+values['-IPADDRESS-'])
-            settings['ip'] = values['-IPADDRESS-']
-        # ..................................................................... CHANGED IP PORT
-        elif event == '-TXPORT-':
-            if values['-TXPORT-'].isdigit():
-                log.debug("[GROUND] Changed IP Port to: "+values['-TXPORT-'])
-                settings['port'] = values['-TXPORT-']
-        # ..................................................................... AUTO REFRESH TIMER VALUE CHANGED
-        elif event == '-AUTOREFRESH-':
-            if values['-AUTOREFRESH-'].isdigit():
-                log.debug("Changed Auto Refresh Status to: "+values['-AUTOREFRESH-'])
-                settings['refresh_status'] = values['-AUTOREFRESH-']
-        # ..................................................................... CLICKED "REFRESH ALL"
-        elif event == '-REFRESHALL-':
-            log.debug("Clicked REFRESH ALL")
-            send_refresh_all(sock, profiles, settings, destination)
-        # ..................................................................... SELECTED A NEW PROFILE
-        elif event == '-PROFILE-':
-            log.debug("Clicked Profile Button to select: "+values['-PROFILE-'])
-            settings['active_profile'] = values['-PROFILE-']
-            update_profile(profiles, settings)
-        # ..................................................................... CLICKED TOGGLE S1
-        elif event == '-S1TOGGLE-':
-            log.debug("Clicked to toggle SERVICE 1 state")
-            if output['is_on'][_S1_]:
-                cmd = "SETSRVC,1,0"     # If ON, send command to turn OFF
-            else:
-                cmd = "SETSRVC,1,1"     # If OFF, send command to turn ON
-            send_command(sock, cmd, destination)
-        # ..................................................................... CLICKED TOGGLE S2
-        elif event == '-S2TOGGLE-':
-            log.debug("Clicked to toggle SERVICE 2 state")
-            if output['is_on'][_S2_]:
-                cmd = "SETSRVC,2,0"     # If ON, send command to turn OFF
-            else:
-                cmd = "SETSRVC,2,1"     # If OFF, send command to turn ON
-            send_command(sock, cmd, destination)
-        # ..................................................................... CLICKED TOGGLE S3
-        elif event == '-S3TOGGLE-':
-            log.debug("Clicked to toggle SERVICE 3 state")
-            if output['is_on'][_S3_]:
-                cmd = "SETSRVC,3,0"     # If ON, send command to turn OFF
-            else:
-                cmd = "SETSRVC,3,1"     # If OFF, send command to turn ON
-            send_command(sock, cmd, destination)
-        # ..................................................................... CLICKED TOGGLE S4
-        elif event == '-S4TOGGLE-':
-            log.debug("Clicked to toggle SERVICE 4 state")
-            if output['is_on'][_S4_]:
-                cmd = "SETSRVC,4,0"     # If ON, send command to turn OFF
-            else:
-                cmd = "SETSRVC,4,1"     # If OFF, send command to turn ON
-            send_command(sock, cmd, destination)
-        # ..................................................................... CLICKED TOGGLE S5
-        elif event == '-S5TOGGLE-':
-            log.debug("Clicked to toggle SERVICE 5 state")                                              # This COPY-PASTE stuff is
-            if output['is_on'][_S5_]:                                                                           # looking for trouble
-                cmd = "SETSRVC,5,0"     # If ON, send command to turn OFF                               # TODO: Find another way
+                parse_telemetry(full_packet, is_save_to_log_file=True, time_of_reception=time_of_reception)
+            except (ValueError, IndexError) as error:
+                log.warning(f"ERROR: TM packet could not be processed ({error!r}): {data!r}")
+            telemetry_dirty = True
+        if tm_packets_dropped != tm_packets_dropped_reported:
+            # --------------------------------------------------- #
+            # Reported once per loop iteration, not once per drop #
+            # --------------------------------------------------- #
+            log.warning(f"WARNING: TM queue overflow, "
+                        f"{tm_packets_dropped - tm_packets_dropped_reported} oldest packets dropped")
+            tm_packets_dropped_reported = tm_packets_dropped
+        if telemetry_dirty:
+            refresh_telemetry_stats_on_gui(services, values)
+            telemetry_dirty = False
+
+        destination = cached_cfg['destination']
+        # ------------------------------------------------------ #
+        # Check for expiration of AUTO-REFRESH delay. This is    #
+        # done at each iteration, not only on a timeout, since a #
+        # steady flow of events would keep the timeout away.     #
+        # ------------------------------------------------------ #
+        delay_sec = monotonic() - start
+        if cached_cfg['refresh_s'] is not None:      # None means the field does not hold a valid number
+            if delay_sec >= cached_cfg['refresh_s']:
+                send_refresh_all(sock, profiles, settings, destination)
+                start = monotonic()     # restart the timer delay
+                # ----------------------------------------- #
+                # Take the opportunity to verify if heaters #
+                # accumulated some power consumption. Note  #
+                # that these timestamps must stay on the    #
+                # same base as the ones parsed from the TM  #
+                # (see parse_telemetry), so no monotonic.   #
+                # ----------------------------------------- #
+                if use_batteries:
+                    now = time.time()
+                    accumulate_wh(_HEATERS_, battery['heaters_consumption'], now)
+                    output['last_update_time'][_HEATERS_] = now
+                update_if_changed('-HEATERS_WH-', f"{output['accumulated_Wh'][_HEATERS_]:.3f}")
+        # ---------------------------------------- #
+        # Update running time clock UTC and status #
+        # ---------------------------------------- #
+        time_str = datetime.utcnow().isoformat(sep=' ', timespec='seconds')
+        if time_str != last_shown_time_str:
+            widgets['-CURRENT_TIME-'].update(time_str)
+            last_shown_time_str = time_str
+        if use_batteries:
+            update_if_changed('-STATUS-', 'USING BATTERIES', text_color='white', background_color='green')
+        else:
+            update_if_changed('-STATUS-', 'USING POWER SUPPLY', text_color='white', background_color='red')
+        if time_last_packet_received <= 0.0:
+            update_if_changed('-TIME_SINCE_PDU-', 'n/a')
+        else:
+            delta = time.time() - time_last_packet_received
+            if delta > 0.0:
+                update_if_changed('-TIME_SINCE_PDU-', f"{int(delta)}")
             else:
-                cmd = "SETSRVC,5,1"     # If OFF, send command to turn ON
-            send_command(sock, cmd, destination)
-        # ..................................................................... CLICKED TOGGLE S6
-        elif event == '-S6TOGGLE-':
-            log.debug("Clicked to toggle SERVICE 6 state")
-            if output['is_on'][_S6_]:
-                cmd = "SETSRVC,6,0"     # If ON, send command to turn OFF
+                update_if_changed('-TIME_SINCE_PDU-', 'Error')
+        # ------------------------------------------------ #
+        # Then see which event was triggered (if there was #
+        # one), and proceed with what we need to do.       #
+        # ------------------------------------------------ #
+        # ..................................................................... TIMEOUT OR TM RECEIVED
+        if event in (sg.TIMEOUT_EVENT, '-TM_RECEIVED-'):
+            pass    # Nothing more to do, the timers and the telemetry queue were processed above
+        # ..................................................................... SIMPLE EVENTS (see EVENT_HANDLERS)
+        elif event in EVENT_HANDLERS:
+            EVENT_HANDLERS[event](values, settings, sock, cached_cfg, profiles)
+        # ..................................................................... CLICKED TOGGLE Sn
+        elif event in TOGGLE_EVENTS:
+            service = TOGGLE_EVENTS[event]
+            log.debug(f"Clicked to toggle SERVICE {service+1} state")
+            if output['is_on'][service]:
+                cmd = f"SETSRVC,{service+1},0"      # If ON, send command to turn OFF
             else:
-                cmd = "SETSRVC,6,1"     # If OFF, send command to turn ON
+                cmd = f"SETSRVC,{service+1},1"      # If OFF, send command to turn ON
             send_command(sock, cmd, destination)
-        # ..................................................................... CLICKED REFRESH S1
-        elif event == '-S1REFRESH-':
-            log.debug("Clicked to refresh SERVICE 1 status")
-            send_command(sock, "STATUS,1", destination)
-        # ..................................................................... CLICKED REFRESH S2
-        elif event == '-S2REFRESH-':
-            log.debug("Clicked to refresh SERVICE 2 status")
-            send_command(sock, "STATUS,2", destination)
-        # ..................................................................... CLICKED REFRESH S3
-        elif event == '-S3REFRESH-':
-            log.debug("Clicked to refresh SERVICE 3 status")
-            send_command(sock, "STATUS,3", destination)
-        # ..................................................................... CLICKED REFRESH S4
-        elif event == '-S4REFRESH-':
-            log.debug("Clicked to refresh SERVICE 4 status")
-            send_command(sock, "STATUS,4", destination)
-        # ..................................................................... CLICKED REFRESH S5
-        elif event == '-S5REFRESH-':
-            log.debug("Clicked to refresh SERVICE 5 status")
-            send_command(sock, "STATUS,5", destination)
-        # ..................................................................... CLICKED REFRESH S6
-        elif event == '-S6REFRESH-':
-            log.debug("Clicked to refresh SERVICE 6 status")
-            send_command(sock, "STATUS,6", destination)
+        # ..................................................................... CLICKED REFRESH Sn
+        elif event in REFRESH_EVENTS:
+            service = REFRESH_EVENTS[event]
+            log.debug(f"Clicked to refresh SERVICE {service+1} status")
+            send_command(sock, f"STATUS,{service+1}", destination)
         # .....................................................................
         elif event == "Set Theme":
             # TODO: See if we want to implement this. For now it is not.
@@ -625,19 +613,16 @@ def main():
             window.close()
             window = make_window(theme_chosen)
         else:
-            services['service1_group1'] = f"{values['-S1GR1-']}"
-            services['service1_group2'] = f"{values['-S1GR2-']}"
-            services['service2_group1'] = f"{values['-S2GR1-']}"
-            services['service2_group2'] = f"{values['-S2GR2-']}"
-            services['service3_group1'] = f"{values['-S3GR1-']}"
-            services['service3_group2'] = f"{values['-S3GR2-']}"
-            services['service4_group1'] = f"{values['-S4GR1-']}"
-            services['service4_group2'] = f"{values['-S4GR2-']}"
-            services['service5_group1'] = f"{values['-S5GR1-']}"
-            services['service5_group2'] = f"{values['-S5GR2-']}"
-            services['service6_group1'] = f"{values['-S6GR1-']}"
-            services['service6_group2'] = f"{values['-S6GR2-']}"
+            for setting_key, checkbox_key in GROUP_SETTINGS_KEYS:
+                services[setting_key] = 'True' if values[checkbox_key] else 'False'
+            for service in range(_S1_, _S6_ + 1):
+                group1['members'][service] = values[f'-S{service+1}GR1-']
+                group2['members'][service] = values[f'-S{service+1}GR2-']
+
+        log.flush_window()
 
+    stop_receiving(sock)
+    log.close()
     window.close()
 
     save_settings_to_file(CONFIG_FILE, settings, devices, services)
@@ -646,6 +631,167 @@ def main():
     exit(0)
 
 
+# ########################################################################### #
+# Handlers for the simple GUI events, dispatched from the main loop through   #
+# EVENT_HANDLERS (see below). They all take the same arguments, even if they  #
+# do not need all of them. "cached_cfg" is the validated snapshot of the      #
+# network and refresh settings maintained by main().                          #
+# ########################################################################### #
+def on_about(values, settings, sock, cached_cfg, profiles):
+    """ Help->About
+    """
+    sg.popup('An application to control the CSA STRATOS Power Distribution Unit',
+             'VERSION: '+VERSION_STRING,
+             '(C) Canadian Space Agency 2021')
+
+
+def on_log_file_set(values, settings, sock, cached_cfg, profiles):
+    """ Clicked SET to select a new log file
+    """
+    proposed_filename = time.strftime("%Y%m%d_%H%M%S") + "-PDU LOG.txt"
+    is_cancel, log_filename = log_file_set_popup(proposed_filename)
+    if not is_cancel:
+        log.set_filename(log_filename)
+        widgets['-LOG_FILE-'].update(log_filename)
+        settings['log_file'] = log_filename
+
+
+def on_batteries_toggle(values, settings, sock, cached_cfg, profiles):
+    """ Toggle between USE BATTERIES and USE POWER SUPPLY
+    """
+    global use_batteries
+    if use_batteries:               # There must be a way just to toggle...
+        use_batteries = False
+        output['last_update_time'][_HEATERS_] = time.time()
+        log.event("END_USE_BATTERIES", is_save_to_log_file=True)     #NOTE: DO NOT CHANGE, "END_USE_BATTERIES" is a keyword
+        widgets['-ON_BATTERIES_TOGGLE-'].update('USE BATTERIES')
+    else:
+        use_batteries = True
+        log.event("START_USE_BATTERIES", is_save_to_log_file=True)  # NOTE: DO NOT CHANGE, "START_USE_BATTERIES" is a keyword
+        widgets['-ON_BATTERIES_TOGGLE-'].update('USE POWER SUPPLY')
+
+
+def on_ip_address(values, settings, sock, cached_cfg, profiles):
+    """ Changed IP address
+    """
+    log.debug("[GROUND] Changed IP Address to: "+values['-IPADDRESS-'])
+    settings['ip'] = values['-IPADDRESS-']
+    cached_cfg['ip'] = values['-IPADDRESS-']
+    cached_cfg['destination'] = (cached_cfg['ip'], cached_cfg['port'])
+
+
+def on_tx_port(values, settings, sock, cached_cfg, profiles):
+    """ Changed IP port
+    """
+    if values['-TXPORT-'].isdigit():
+        log.debug("[GROUND] Changed IP Port to: "+values['-TXPORT-'])
+        settings['port'] = values['-TXPORT-']
+        cached_cfg['port'] = int(values['-TXPORT-'])
+        cached_cfg['destination'] = (cached_cfg['ip'], cached_cfg['port'])
+
+
+def get_refresh_period_s(text):
+    """ AUTO-REFRESH period, in seconds, from the text of the field. It is
+        never shorter than AUTO_REFRESH_MIN_S, so that 0 does not flood the
+        PDU. None (AUTO-REFRESH disabled) if the text is not a valid number.
+    """
+    if text.isdigit():
+        return max(int(text), AUTO_REFRESH_MIN_S)
+    return None
+
+
+def on_auto_refresh(values, settings, sock, cached_cfg, profiles):
+    """ Auto refresh timer value changed
+    """
+    if values['-AUTOREFRESH-'].isdigit():
+        log.debug("Changed Auto Refresh Status to: "+values['-AUTOREFRESH-'])
+        settings['refresh_status'] = values['-AUTOREFRESH-']
+    cached_cfg['refresh_s'] = get_refresh_period_s(values['-AUTOREFRESH-'])
+
+
+def on_refresh_all(values, settings, sock, cached_cfg, profiles):
+    """ Clicked "REFRESH ALL" (the Amp. column header)
+    """
+    log.debug("Clicked REFRESH ALL")
+    send_refresh_all(sock, profiles, settings, cached_cfg['destination'])
+
+
+def on_profile(values, settings, sock, cached_cfg, profiles):
+    """ Selected a new profile
+    """
+    log.debug("Clicked Profile Button to select: "+values['-PROFILE-'])
+    settings['active_profile'] = values['-PROFILE-']
+    update_profile(profiles, settings)
+
+
+# --------------------------------------------------------------------------- #
+# Event key ==> handler. A dictionary lookup instead of a long if/elif chain  #
+# --------------------------------------------------------------------------- #
+EVENT_HANDLERS = {
+    'About': on_about,
+    '-LOG_FILE_SET-': on_log_file_set,
+    '-ON_BATTERIES_TOGGLE-': on_batteries_toggle,
+    '-IPADDRESS-': on_ip_address,
+    '-TXPORT-': on_tx_port,
+    '-AUTOREFRESH-': on_auto_refresh,
+    '-REFRESHALL-': on_refresh_all,
+    '-PROFILE-': on_profile,
+}
+
+
+# =========================================================================== #
+# =========================================================================== #
+def receive_telemetry(sock, telemetry_queue):
+    """ Receive thread: blocks on the socket and puts every datagram received
+        in "telemetry_queue", then wakes up the GUI thread with a
+        '-TM_RECEIVED-' event. Parsing and logging are left to the GUI thread.
+        If the GUI thread falls behind and the queue is full, the oldest packet
+        is dropped (and counted in tm_packets_dropped) rather than blocking.
+    """
+    global window, tm_packets_dropped
+    # ------------------------------------------------------- #
+    # The receive buffer is allocated once and reused. Only   #
+    # the bytes actually received are copied for the queue,   #
+    # since the buffer is overwritten by the next datagram.   #
+    # ------------------------------------------------------- #
+    recv_buffer = bytearray(2048)
+    recv_view = memoryview(recv_buffer)
+    while True:
+        try:
+            nbytes, address = sock.recvfrom_into(recv_buffer)
+        except ConnectionResetError:
+            continue    # Windows reports a previous ICMP "port unreachable" this way, ignore it
+        except OSError:
+            break       # Socket closed, the application is exiting
+        if address is None:
+            break       # Socket shut down (see stop_receiving), the application is exiting
+        packet = bytes(recv_view[:nbytes])
+        try:
+            telemetry_queue.put_nowait(packet)
+        except Full:
+            try:
+                telemetry_queue.get_nowait()
+            except Empty:
+                pass
+            telemetry_queue.put_nowait(packet)  # Cannot be full again, this is the only producer
+            tm_packets_dropped += 1
+        window.write_event_value('-TM_RECEIVED-', None)
+
+
+# =========================================================================== #
+# =========================================================================== #
+def stop_receiving(sock):
+    """ Ends the receive thread and closes the socket. The shutdown is what
+        wakes up a thread blocked on the socket on Linux, closing is enough on
+        Windows (where shutdown fails for an unconnected socket).
+    """
+    try:
+        sock.shutdown(SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
+
+
 # =========================================================================== #
 #          ___ ___ _  _ ___     ___ ___  __  __ __  __   _   _  _ ___         #
 #         / __| __| \| |   \   / __/ _ \|  \/  |  \/  | /_\ | \| |   \        #
@@ -671,12 +817,10 @@ def send_refresh_all(sock, profiles, settings, destination):
         NOTE: Because of the new groups calculations, we need status of all outputs
         all of the time!
     """
-    send_command(sock, 'STATUS,1', destination)
-    send_command(sock, 'STATUS,2', destination)
-    send_command(sock, 'STATUS,3', destination)
-    send_command(sock, 'STATUS,4', destination)
-    send_command(sock, 'STATUS,5', destination)
-    send_command(sock, 'STATUS,6', destination)
+    global log
+    log.tx_many([command for command, datagram in REFRESH_ALL_COMMANDS], is_save_to_log_file=True)
+    for command, datagram in REFRESH_ALL_COMMANDS:
+        sock.sendto(datagram, destination)
 
 
 # =========================================================================== #
@@ -685,10 +829,36 @@ def send_refresh_all(sock, profiles, settings, destination):
 #   |  _/ _ \|   /\__ \ _|    | | | _|| |__| _|| |\/| | _|  | | |   /\ V /    #
 #   |_|/_/ \_\_|_\|___/___|   |_| |___|____|___|_|  |_|___| |_| |_|_\ |_|     #
 # =========================================================================== #
-def parse_telemetry(raw_packet, is_save_to_log_file):
+def parse_timestamp(text):
+    """ Converts a UTC timestamp in the fixed format of the log headers
+        (YYYY-MM-DD HH:MM:SS.sss) to seconds since the epoch. This is much
+        faster than going through a datetime, since the date part (the same for
+        almost all packets) is converted only once. Raises ValueError if the
+        timestamp cannot be decoded.
+    """
+    if len(text) < 19:
+        raise ValueError(f"timestamp too short: {text}")
+    date = text[0:10]
+    day_start = _DAY_START_CACHE.get(date)
+    if day_start is None:
+        day_start = calendar.timegm((int(date[0:4]), int(date[5:7]), int(date[8:10]), 0, 0, 0, 0, 0, 0))
+        _DAY_START_CACHE[date] = day_start
+    seconds = day_start + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+    if len(text) >= 23:
+        seconds += int(text[20:23]) * 0.001
+    return seconds
+
+
+_DAY_START_CACHE = {}       # "YYYY-MM-DD" ==> seconds since the epoch at 00:00:00 UTC
+
+
+# =========================================================================== #
+# =========================================================================== #
+def parse_telemetry(raw_packet, is_save_to_log_file, time_of_reception=None):
     """ Parse any incoming telemetry packet and update the GUI accordingly.
         Note that the packet must be in the standard format:
         SRC,YYYY-MM-DD HH:MM:SS.sss,PKT_ID,...
+        If "time_of_reception" is not given, it is decoded from the packet.
     """
     global window, log, output, battery, use_batteries, time_last_packet_received
 
@@ -699,11 +869,12 @@ def parse_telemetry(raw_packet, is_save_to_log_file):
         return
 
     source = packet[0]
-    try:
-        time_of_reception = datetime.fromisoformat(packet[1]).timestamp()
-    except:
-        log.warning(f"ERROR: timestamp could not be decoded: {packet[1]}", is_save_to_log_file)
-        time_of_reception = datetime.utcnow().timestamp()
+    if time_of_reception is None:
+        try:
+            time_of_reception = parse_timestamp(packet[1])
+        except:
+            log.warning(f"ERROR: timestamp could not be decoded: {packet[1]}", is_save_to_log_file)
+            time_of_reception = time.time()
     header = packet[2]  # Get message header
 
     if source != 'PDU':
@@ -716,76 +887,138 @@ def parse_telemetry(raw_packet, is_save_to_log_file):
             if packet[3] == "START_USE_BATTERIES":
                 use_batteries = True
                 output['last_update_time'][_HEATERS_] = time_of_reception
-            elif packet[3] == "END_USE_BATTERIES" and float(output['last_update_time'][_HEATERS_]) > 0.0:
+            elif packet[3] == "END_USE_BATTERIES" and output['last_update_time'][_HEATERS_] > 0.0:
                 use_batteries = False
-                delta = time_of_reception - output['last_update_time'][_HEATERS_]
-                if float(delta) > 0.0:
-                    output['accumulated_Wh'][_HEATERS_] += (float(battery['heaters_consumption']) * (delta / 3600.0) * float(battery['nominal_voltage']))
+                accumulate_wh(_HEATERS_, battery['heaters_consumption'], time_of_reception)
                 output['last_update_time'][_HEATERS_] = 0.0
         return  # This is not from the PDU, will not process further
     else:
         time_last_packet_received = time_of_reception
 
-    # ......................................................................... SRVCSET
-    if header == "SRVCSET":  # Update service state
-        if len(packet) < 5:
-            log.warning("SRVCSET packet error - Too short", is_save_to_log_file)
-        else:
-            service_id, service_state = packet[3], packet[4]
-            if service_id.isdigit():
-                index = int(service_id)
-                if (index >= 1) and (index <= 6):
-                    index = index - 1   # The array starts at zero!
-                    output['is_on'][index] = (service_state == '1')
-                else:
-                    log.warning(f"Service index ({service_id}) out of range for SRVCSET received", is_save_to_log_file)
-            else:
-                log.warning(f"Bad service index ({service_id}) for SRVCSET received", is_save_to_log_file)
-    # ......................................................................... STATUS
-    elif header == "STATUS":
-        if len(packet) < 6:
-            log.warning("STATUS packet error - Too short", is_save_to_log_file)
+    # ---------------------------------------------------------- #
+    # The header selects the handler (see TM_HANDLERS). The rest #
+    # is unexpected, we might want to flag it.                   #
+    # ---------------------------------------------------------- #
+    TM_HANDLERS.get(header, on_tm_ignored)(packet, is_save_to_log_file, time_of_reception)
+
+
+# =========================================================================== #
+# =========================================================================== #
+def service_index(service_id):
+    """ Converts a service id received from the PDU ('1' to '6') to the index
+        of the service in our arrays (which start at zero!). Returns
+        SERVICE_INDEX_BAD if it is not a number, SERVICE_INDEX_OUT_OF_RANGE if
+        it is not a valid service.
+    """
+    try:
+        index = int(service_id) - 1
+    except ValueError:
+        return SERVICE_INDEX_BAD
+    if _S1_ <= index <= _S6_:
+        return index
+    return SERVICE_INDEX_OUT_OF_RANGE
+
+
+# =========================================================================== #
+# =========================================================================== #
+def on_tm_srvcset(packet, is_save_to_log_file, time_of_reception):
+    """ SRVCSET: Update service state
+    """
+    global log, output
+    if len(packet) < 5:
+        log.warning("SRVCSET packet error - Too short", is_save_to_log_file)
+    else:
+        service_id, service_state = packet[3], packet[4]
+        index = service_index(service_id)
+        if index >= 0:
+            output['is_on'][index] = (service_state == '1')
+        elif index == SERVICE_INDEX_OUT_OF_RANGE:
+            log.warning(f"Service index ({service_id}) out of range for SRVCSET received", is_save_to_log_file)
         else:
-            service_id, service_state, value = packet[3], packet[4], packet[5]
-            if service_id.isdigit():
-                index = int(service_id)
-                if (index >= 1) and (index <= 6):
-                    index = index - 1   # The array starts at zero!
-                    current = float(value)
-                    if current < 0.0:                                               #V2.06
-                        current = 0.0
-                    if not output['is_on'][index]:                                  #V2.07
-                        current = 0.0
-                    output['current'][index] = current
-                    output['is_on'][index] = (service_state == '1')
-                    # ------------------------------ #
-                    # Calculated accumulated current #
-                    # ------------------------------ #
-                    if use_batteries:
-                        if output['last_update_time'][index] > 0.0:
-                            delta = time_of_reception - output['last_update_time'][index]
-                            output['accumulated_Wh'][index] += (output['current'][index] * (delta/3600.0) * float(battery['nominal_voltage']))
-                        output['last_update_time'][index] = time_of_reception
-                else:
-                    log.warning(f"Service index ({service_id}) out of range for STATUS received", is_save_to_log_file)
-            else:
-                log.warning(f"Bad service index ({service_id}) for STATUS received", is_save_to_log_file)
-    # .........................................................................
-    elif header == "IPSET":
-        pass
-    # .........................................................................
-    elif header == "PORTSET":
-        pass
-    # .........................................................................
-    elif header == "Resetting":
-        pass
-    # .........................................................................
-    elif header == "CMDERROR":
-        pass
-    # .........................................................................
+            log.warning(f"Bad service index ({service_id}) for SRVCSET received", is_save_to_log_file)
+
+
+# =========================================================================== #
+# =========================================================================== #
+def on_tm_status(packet, is_save_to_log_file, time_of_reception):
+    """ STATUS: Update service state and current, and accumulate consumption
+    """
+    global log, output, use_batteries
+    if len(packet) < 6:
+        log.warning("STATUS packet error - Too short", is_save_to_log_file)
     else:
-        # The rest is unexpected, we might want to flag it
-        pass
+        service_id, service_state, value = packet[3], packet[4], packet[5]
+        index = service_index(service_id)
+        if index >= 0:
+            current = float(value)
+            if current < 0.0:                                               #V2.06
+                current = 0.0
+            if not output['is_on'][index]:                                  #V2.07
+                current = 0.0
+            output['current'][index] = current
+            output['is_on'][index] = (service_state == '1')
+            # ------------------------------ #
+            # Calculated accumulated current #
+            # ------------------------------ #
+            if use_batteries:
+                accumulate_wh(index, current, time_of_reception)
+                output['last_update_time'][index] = time_of_reception
+        elif index == SERVICE_INDEX_OUT_OF_RANGE:
+            log.warning(f"Service index ({service_id}) out of range for STATUS received", is_save_to_log_file)
+        else:
+            log.warning(f"Bad service index ({service_id}) for STATUS received", is_save_to_log_file)
+
+
+# =========================================================================== #
+# =========================================================================== #
+def on_tm_ignored(packet, is_save_to_log_file, time_of_reception):
+    """ For packets that only acknowledge a command and need no processing
+    """
+    pass
+
+
+# --------------------------------------------------------------------------- #
+# PDU telemetry header ==> handler, built once. A dictionary lookup instead   #
+# of a long if/elif chain                                                     #
+# --------------------------------------------------------------------------- #
+TM_HANDLERS = {
+    'SRVCSET': on_tm_srvcset,
+    'STATUS': on_tm_status,
+    'IPSET': on_tm_ignored,
+    'PORTSET': on_tm_ignored,
+    'Resetting': on_tm_ignored,
+    'CMDERROR': on_tm_ignored,
+}
+
+
+# ########################################################################### #
+# ########################################################################### #
+def accumulate_wh(index, current, time_now):
+    """ Adds to output['accumulated_Wh'][index] the energy used by a constant
+        "current" (A) at the battery nominal voltage, between the last update
+        time of this output and "time_now". Nothing is added if there is no
+        last update time yet. The caller is responsible for updating
+        output['last_update_time'][index] afterward.
+        "index" must be as defined in header (i.e. _S1_, ..., _HEATERS_)
+    """
+    global output, battery
+    last_update_time = output['last_update_time'][index]
+    if last_update_time > 0.0:
+        delta = time_now - last_update_time
+        if delta > 0.0:
+            output['accumulated_Wh'][index] += current * delta * battery['wh_per_amp_second']
+
+
+# =========================================================================== #
+# =========================================================================== #
+def get_limit_wh(text):
+    """ Group limit typed by the operator, in Wh. Anything that is not a
+        number (i.e. an empty field while editing) means no limit (0).
+    """
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return 0.0
 
 
 # ########################################################################### #
@@ -797,125 +1030,85 @@ def parse_telemetry(raw_packet, is_save_to_log_file):
 def refresh_telemetry_stats_on_gui(services, values):
     """ Refresh all GUI elements related to dynamic telemetry values
     """
-    global window, battery, output, group1, group2, use_batteries
-
-    window['-S1TOGGLE-'].update(get_service_text_status(_S1_, services), button_color=get_service_color_status(_S1_))
-    window['-S2TOGGLE-'].update(get_service_text_status(_S2_, services), button_color=get_service_color_status(_S2_))
-    window['-S3TOGGLE-'].update(get_service_text_status(_S3_, services), button_color=get_service_color_status(_S3_))
-    window['-S4TOGGLE-'].update(get_service_text_status(_S4_, services), button_color=get_service_color_status(_S4_))
-    window['-S5TOGGLE-'].update(get_service_text_status(_S5_, services), button_color=get_service_color_status(_S5_))
-    window['-S6TOGGLE-'].update(get_service_text_status(_S6_, services), button_color=get_service_color_status(_S6_))
-    window['-S1REFRESH-'].Update(f"{output['current'][_S1_]:.3f}")
-    window['-S2REFRESH-'].Update(f"{output['current'][_S2_]:.3f}")
-    window['-S3REFRESH-'].Update(f"{output['current'][_S3_]:.3f}")
-    window['-S4REFRESH-'].Update(f"{output['current'][_S4_]:.3f}")
-    window['-S5REFRESH-'].Update(f"{output['current'][_S5_]:.3f}")
-    window['-S6REFRESH-'].Update(f"{output['current'][_S6_]:.3f}")
+    global last_shown, widgets, battery, output, group1, group2, use_batteries
+
+    for service in range(_S1_, _S6_ + 1):
+        update_if_changed(f'-S{service+1}TOGGLE-', get_service_text_status(service, services),
+                          button_color=get_service_color_status(service))
+        update_if_changed(f'-S{service+1}REFRESH-', f"{output['current'][service]:.3f}")
     # .........................................................................Group 1
-    group1['Wh'] = 0.0
-    group1['A'] = 0.0
-    if values['-S1GR1-']:
-        group1['A'] += output['current'][_S1_]
-        group1['Wh'] += output['accumulated_Wh'][_S1_]
-    if values['-S2GR1-']:
-        group1['A'] += output['current'][_S2_]
-        group1['Wh'] += output['accumulated_Wh'][_S2_]
-    if values['-S3GR1-']:
-        group1['A'] += output['current'][_S3_]
-        group1['Wh'] += output['accumulated_Wh'][_S3_]
-    if values['-S4GR1-']:
-        group1['A'] += output['current'][_S4_]
-        group1['Wh'] += output['accumulated_Wh'][_S4_]
-    if values['-S5GR1-']:
-        group1['A'] += output['current'][_S5_]
-        group1['Wh'] += output['accumulated_Wh'][_S5_]
-    if values['-S6GR1-']:
-        group1['A'] += output['current'][_S6_]
-        group1['Wh'] += output['accumulated_Wh'][_S6_]
-    window['-GR1_A-'].Update(f"{group1['A']:.3f}")
-    window['-GR1_WH-'].Update(f"{group1['Wh']:.3f}")
-    limit = float(values['-GR1_LIMIT_WH-'])
+    group1['A'] = sum(compress(output['current'], group1['members']))
+    group1['Wh'] = sum(compress(output['accumulated_Wh'], group1['members']))     # Heaters are in no group
+    update_if_changed('-GR1_A-', f"{group1['A']:.3f}")
+    update_if_changed('-GR1_WH-', f"{group1['Wh']:.3f}")
+    limit = get_limit_wh(values['-GR1_LIMIT_WH-'])
     if limit > 0.0:
         threshold = limit * 0.1
         if limit - group1['Wh'] <= threshold:
-            window['-GR1_LIMIT_WH-'].update(background_color='red')
-            window['-GR1_WH-'].update(background_color='red')
+            update_if_changed('-GR1_LIMIT_WH-', background_color='red')
+            update_if_changed('-GR1_WH-', background_color='red')
         else:
-            window['-GR1_LIMIT_WH-'].update(background_color='white')
-            window['-GR1_WH-'].update(background_color='white')
+            update_if_changed('-GR1_LIMIT_WH-', background_color='white')
+            update_if_changed('-GR1_WH-', background_color='white')
     # .........................................................................Group 2
-    group2['Wh'] = 0.0
-    group2['A'] = 0.0
-    if values['-S1GR2-']:
-        group2['A'] += output['current'][_S1_]
-        group2['Wh'] += output['accumulated_Wh'][_S1_]
-    if values['-S2GR2-']:
-        group2['A'] += output['current'][_S2_]
-        group2['Wh'] += output['accumulated_Wh'][_S2_]
-    if values['-S3GR2-']:
-        group2['A'] += output['current'][_S3_]
-        group2['Wh'] += output['accumulated_Wh'][_S3_]
-    if values['-S4GR2-']:
-        group2['A'] += output['current'][_S4_]
-        group2['Wh'] += output['accumulated_Wh'][_S4_]
-    if values['-S5GR2-']:
-        group2['A'] += output['current'][_S5_]
-        group2['Wh'] += output['accumulated_Wh'][_S5_]
-    if values['-S6GR2-']:
-        group2['A'] += output['current'][_S6_]
-        group2['Wh'] += output['accumulated_Wh'][_S6_]
-    window['-GR2_A-'].Update(f"{group2['A']:.3f}")
-    window['-GR2_WH-'].Update(f"{group2['Wh']:.3f}")
-    limit = float(values['-GR2_LIMIT_WH-'])
+    group2['A'] = sum(compress(output['current'], group2['members']))
+    group2['Wh'] = sum(compress(output['accumulated_Wh'], group2['members']))     # Heaters are in no group
+    update_if_changed('-GR2_A-', f"{group2['A']:.3f}")
+    update_if_changed('-GR2_WH-', f"{group2['Wh']:.3f}")
+    limit = get_limit_wh(values['-GR2_LIMIT_WH-'])
     if limit > 0.0:
         threshold = limit * 0.1
         if limit - group2['Wh'] <= threshold:
-            window['-GR2_LIMIT_WH-'].update(background_color='red')
-            window['-GR2_WH-'].update(background_color='red')
+            update_if_changed('-GR2_LIMIT_WH-', background_color='red')
+            update_if_changed('-GR2_WH-', background_color='red')
         else:
-            window['-GR2_LIMIT_WH-'].update(background_color='white')
-            window['-GR2_WH-'].update(background_color='white')
+            update_if_changed('-GR2_LIMIT_WH-', background_color='white')
+            update_if_changed('-GR2_WH-', background_color='white')
     # .........................................................................Total
     # total_groups_A = float(group1['A']) + float(group2['A'])
     # print(f"updating total currant for groups: {total_groups_A}")
     # window['-GROUPS_A-'].Update(f"{total_groups_A:.3f}")
-    total_A = float(output['current'][_S1_])
-    total_A += float(output['current'][_S2_])
-    total_A += float(output['current'][_S3_])
-    total_A += float(output['current'][_S4_])
-    total_A += float(output['current'][_S5_])
-    total_A += float(output['current'][_S6_])
+    total_A = sum(output['current'])
     if use_batteries:
-        total_A += float(battery['heaters_consumption'])
-        window['-HEATERS_A-'].update(background_color='white')
+        total_A += battery['heaters_consumption']
+        update_if_changed('-HEATERS_A-', background_color='white')
     else:
-        window['-HEATERS_A-'].update(background_color='gray')
-    window['-TOTAL_A-'].Update(f"{total_A:.3f}")
+        update_if_changed('-HEATERS_A-', background_color='gray')
+    update_if_changed('-TOTAL_A-', f"{total_A:.3f}")
     # .........................................................................Battery
     battery['progress_wh'] = 0.0
-    total_used = float(output['accumulated_Wh'][_S1_])
-    total_used += float(output['accumulated_Wh'][_S2_])
-    total_used += float(output['accumulated_Wh'][_S3_])
-    total_used += float(output['accumulated_Wh'][_S4_])
-    total_used += float(output['accumulated_Wh'][_S5_])
-    total_used += float(output['accumulated_Wh'][_S6_])
-    total_used += float(output['accumulated_Wh'][_HEATERS_])
+    total_used = sum(output['accumulated_Wh'])     # All services and heaters
     offset = 0.0
     if values['-OFFSET_WH-']:
         if values['-OFFSET_WH-'].isdigit():
             offset = float(values['-OFFSET_WH-'])
     total_used += offset
-    window['-TOTAL_WH-'].update(f"{total_used:.3f}")
-    battery['progress_wh'] = float(battery['max_wh']) - total_used
-    window['-BATTERY_WH-'].update(f"{battery['progress_wh']:.3f}")
-    battery_percent = int(float(battery['progress_wh']) / float(battery['max_wh']) * 100.0)
-    window['-BATTERY_PERCENT-'].update(f"{battery_percent}")
-    if battery_percent > 100:
-        window['-BATTERY_PROGRESS-'].update_bar(100)
-    elif battery_percent < 0:
-        window['-BATTERY_PROGRESS-'].update_bar(0)
-    else:
-        window['-BATTERY_PROGRESS-'].update_bar(battery_percent)
+    update_if_changed('-TOTAL_WH-', f"{total_used:.3f}")
+    battery['progress_wh'] = battery['max_wh'] - total_used
+    update_if_changed('-BATTERY_WH-', f"{battery['progress_wh']:.3f}")
+    battery_percent = int(battery['progress_wh'] / battery['max_wh'] * 100.0)
+    update_if_changed('-BATTERY_PERCENT-', f"{battery_percent}")
+    bar = min(max(battery_percent, 0), 100)
+    if last_shown.get('-BATTERY_PROGRESS-') != bar:
+        widgets['-BATTERY_PROGRESS-'].update_bar(bar)
+        last_shown['-BATTERY_PROGRESS-'] = bar
+
+
+# ########################################################################### #
+# ########################################################################### #
+def update_if_changed(key, *args, **kwargs):
+    """ Calls widgets[key].update(*args, **kwargs) only if the widget does not
+        already display that. Widget updates are expensive compared to comparing
+        a few values, and most values do not change at every refresh. What was
+        shown is remembered by key and arguments names, so that changing the
+        text and (separately) the colors of a same widget do not interfere.
+    """
+    global widgets, last_shown
+    shown_key = (key, len(args)) + tuple(kwargs)
+    shown = args + tuple(kwargs.values())
+    if last_shown.get(shown_key) != shown:
+        widgets[key].update(*args, **kwargs)
+        last_shown[shown_key] = shown
 
 
 # ########################################################################### #
@@ -925,11 +1118,9 @@ def get_service_color_status(service_id):
     """
     global output
     if output['is_on'][service_id]:
-        color = ('white', 'green')
-        return color
+        return _COLOR_ON
     else:
-        color = ('white', 'firebrick3')
-        return color
+        return _COLOR_OFF
 
 
 # ########################################################################### #
@@ -940,38 +1131,10 @@ def get_service_text_status(service, services):
     """
     global output
 
-    text = f'S{service+1}- UNDEFINED SERVICE - N/A'
-    if service == _S1_:
-        if output['is_on'][service]:
-            text = 'S1- ' + services['service1'] + ' - ON'
-        else:
-            text = 'S1- ' + services['service1'] + ' - OFF'
-    if service == _S2_:
-        if output['is_on'][service]:
-            text = 'S2- ' + services['service2'] + ' - ON'
-        else:
-            text = 'S2- ' + services['service2'] + ' - OFF'
-    if service == _S3_:
-        if output['is_on'][service]:
-            text = 'S3- ' + services['service3'] + ' - ON'
-        else:
-            text = 'S3- ' + services['service3'] + ' - OFF'
-    if service == _S4_:
-        if output['is_on'][service]:
-            text = 'S4- ' + services['service4'] + ' - ON'
-        else:
-            text = 'S4- ' + services['service4'] + ' - OFF'
-    if service == _S5_:
-        if output['is_on'][service]:
-            text = 'S5- ' + services['service5'] + ' - ON'
-        else:
-            text = 'S5- ' + services['service5'] + ' - OFF'
-    if service == _S6_:
-        if output['is_on'][service]:
-            text = 'S6- ' + services['service6'] + ' - ON'
-        else:
-            text = 'S6- ' + services['service6'] + ' - OFF'
-    return text
+    if not _S1_ <= service <= _S6_:
+        return f'S{service+1}- UNDEFINED SERVICE - N/A'
+    state = 'ON' if output['is_on'][service] else 'OFF'
+    return f'S{service+1}- {services[SERVICE_KEYS[service]]} - {state}'
 
 
 # ########################################################################### #
@@ -1023,28 +1186,22 @@ def save_settings_to_file(filename, settings, devices, services):
     """ Save all settings in filename
     """
     parser = configparser.ConfigParser()
-    # TODO: There might be a better way to just re-insert the sections into the "parser"! Find it
-    # ....................................
-    settings_dictionary = OrderedDict()
-    for key, value in settings.items():
-        settings_dictionary[key] = value
-    # ...................................
-    devices_dictionary = OrderedDict()
-    for key, value in devices.items():
-        devices_dictionary[key] = value
-    # ...................................
-    services_dictionary = OrderedDict()
-    for key, value in services.items():
-        services_dictionary[key] = value
-    # ...................................
-    parser.read_dict(OrderedDict((
-        ('settings', settings),
-        ('devices', devices),
-        ('services', services),
-    )))
-    shutil.copy2(CONFIG_FILE, CONFIG_FILE_BACKUP)
-    with open(CONFIG_FILE, 'w') as configfile:
+    parser.read_dict({
+        'settings': settings,
+        'devices': devices,
+        'services': services,
+    })
+    # -------------------------------------------------------- #
+    # Written to a temporary file first, so that a crash while #
+    # writing cannot leave a truncated configuration. The old  #
+    # file is then kept as backup.                             #
+    # -------------------------------------------------------- #
+    temporary_file = CONFIG_FILE + '.tmp'
+    with open(temporary_file, 'w') as configfile:
         parser.write(configfile)
+    if os.path.exists(CONFIG_FILE):
+        os.replace(CONFIG_FILE, CONFIG_FILE_BACKUP)
+    os.replace(temporary_file, CONFIG_FILE)
 
 
 # ########################################################################### #
@@ -1072,17 +1229,142 @@ def read_users(filename):
 class Logger:
     """ Sends to console, in TMTC log window and on file
     """
-    global window
+    global widgets
 
     # ======================================================================= #
     # ======================================================================= #
     def __init__(self):
         self.log_filename = 'pdu_default_log.txt'
+        # --------------------------------------------------------------- #
+        # The log file is written by a background thread, so that a slow  #
+        # disk never stalls the GUI. Lines to write (bytes) are put in    #
+        # this queue, along with the requests to close the file (Event).  #
+        # --------------------------------------------------------------- #
+        self._file_queue = SimpleQueue()
+        self._file_put = self._file_queue.put
+        self._file_encoding = locale.getpreferredencoding(False)   # As for a file opened in text mode (see load_log)
+        threading.Thread(target=self._writer_loop, daemon=True).start()
+        if not DEBUG:
+            self.debug = lambda msg, is_save_to_log_file=False: None   # DEBUG never changes, no need to test it at each call
+        self._window_lines = []     # Lines waiting to be shown in the TMTC log window, see flush_window
+        self._ts_second = None      # Last second formatted by _ts...
+        self._ts_text = ''          # ...and its text
+
+    # ======================================================================= #
+    # ======================================================================= #
+    def _ts(self, time_now=None):
+        """ Timestamp for the log headers: "time_now" (as time.time(), current
+            time if not given) as UTC YYYY-MM-DD HH:MM:SS.sss. The date and time
+            part is formatted only once per second.
+        """
+        if time_now is None:
+            time_now = time.time()
+        milliseconds = int(time_now * 1000.0)
+        second, millisecond = divmod(milliseconds, 1000)
+        if second != self._ts_second:
+            self._ts_second = second
+            self._ts_text = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(second))
+        return f'{self._ts_text}.{millisecond:03d}'
+
+    # ======================================================================= #
+    # ======================================================================= #
+    def _window_write(self, log_msg):
+        """ Queue a line for the TMTC log window
+        """
+        self._window_lines.append(log_msg)
+
+    # ======================================================================= #
+    # ======================================================================= #
+    def flush_window(self):
+        """ Shows the queued lines in the TMTC log window, with a single update
+            of the widget. Must be called regularly (i.e. at each iteration of
+            the main loop).
+        """
+        if self._window_lines:
+            self._window_lines.append('')   # For the last line end
+            widgets['-TMTCLOG-'].update('\n'.join(self._window_lines), append=True)
+            self._window_lines = []
+
+    # ======================================================================= #
+    # ======================================================================= #
+    def _file_write(self, log_msg):
+        """ Queue a line for the log file, already encoded with the same
+            encoding and line ending as when the file was in text mode. All TMTC
+            traffic is ASCII, but service or file names in events may not be.
+        """
+        self._file_put(f'{log_msg}{os.linesep}'.encode(self._file_encoding, 'replace'))
+
+    # ======================================================================= #
+    # ======================================================================= #
+    def _writer_loop(self):
+        """ Writer thread: writes the queued lines to the log file, which is
+            opened on the first line. The file is flushed at least every
+            LOG_FLUSH_PERIOD_S when lines are written. Closes the file on request.
+        """
+        logfile = None
+        is_flushed = True
+        last_flush = monotonic()
+        while True:
+            try:
+                batch = [self._file_queue.get(timeout=LOG_FLUSH_PERIOD_S)]
+            except Empty:
+                batch = []
+            while len(batch) < LOG_WRITE_BATCH_MAX:
+                try:
+                    batch.append(self._file_queue.get_nowait())
+                except Empty:
+                    break
+            lines = []
+            for item in batch + [None]:     # None only marks the end of the batch
+                if isinstance(item, bytes):
+                    lines.append(item)
+                    continue
+                # ----------------------------------------------------- #
+                # The lines queued before a close request (or the end   #
+                # of the batch) are written with a single write().      #
+                # ----------------------------------------------------- #
+                if lines:
+                    try:
+                        if logfile is None:
+                            logfile = open(self.log_filename, 'ab', buffering=LOG_FLUSH_BYTES)
+                        logfile.write(b''.join(lines))
+                        is_flushed = False
+                    except OSError as error:
+                        print(f"ERROR: log file {self.log_filename} could not be written ({error!r})")
+                    lines = []
+                if item is not None:        # Request to close the file, "item" is the Event to set when done
+                    if logfile is not None:
+                        logfile, file_to_close = None, logfile
+                        try:
+                            file_to_close.close()
+                        except OSError as error:
+                            print(f"ERROR: log file {self.log_filename} could not be closed ({error!r})")
+                    is_flushed = True
+                    item.set()
+            if not is_flushed and monotonic() - last_flush >= LOG_FLUSH_PERIOD_S:
+                try:
+                    logfile.flush()
+                except OSError as error:
+                    print(f"ERROR: log file {self.log_filename} could not be written ({error!r})")
+                is_flushed = True
+            if is_flushed:
+                last_flush = monotonic()
+
+    # ======================================================================= #
+    # ======================================================================= #
+    def close(self):
+        """ Wait until everything logged so far is written, then close the log
+            file. It will be reopened if something else is logged.
+        """
+        is_closed = threading.Event()
+        self._file_queue.put(is_closed)
+        is_closed.wait()
 
     # ======================================================================= #
     # ======================================================================= #
     def set_filename(self, filename):
         # TODO: Validate filename
+        self.close()    # What was logged so far goes to the previous file
         is_selected_new = False
         if os.path.exists(filename):
             if os.stat(filename).st_size > 0:
@@ -1116,99 +1398,85 @@ class Logger:
     def load_log(self, filename):
         # TODO: Validate filename and check for exceptions when opening
         print("================== LOADING LOG FILE " + filename + "=====================")
-        file = open(filename, 'r')
-        count = 0
-        # .....................................................................
-        while True:
-            count += 1
-            line = file.readline()
-            if not line:        # if line is empty end of file is reached
-                break
-            line_stripped = line.strip()
-            log.as_is(line_stripped, is_save_to_log_file=False)
-            parse_telemetry(line_stripped, is_save_to_log_file=False)
-        # .....................................................................
-        file.close()
+        with open(filename, 'r') as file:
+            lines = [line.strip() for line in file.read().splitlines()]
+        for line in lines:
+            self._window_write(line)
+            parse_telemetry(line, is_save_to_log_file=False)
 
     # ======================================================================= #
     # ======================================================================= #
     def as_is(self, msg, is_save_to_log_file=True):
         """ Print to log window and file, as is
         """
-        window['-TMTCLOG-'].update(msg + '\n', append=True)
+        self._window_write(msg)
         if is_save_to_log_file:
-            with open(self.log_filename, 'a') as logfile:
-                logfile.write(msg + '\n')
+            self._file_write(msg)
 
     # ======================================================================= #
     # ======================================================================= #
-    def rx(self, msg, is_save_to_log_file=True):
-        """ To log a packet received from the PDU
+    def _emit(self, head, tail, msg, is_save_to_log_file, time_now=None):
+        """ Common to all log methods: the line is "head", the timestamp (see
+            _ts), "tail" and "msg"; it goes to the log window and, if asked,
+            to the log file. Returns the line.
         """
-        log_msg = 'PDU,' + datetime.utcnow().isoformat(sep=' ', timespec='milliseconds') + ',' + msg
-        window['-TMTCLOG-'].update(log_msg + '\n', append=True)
+        log_msg = f'{head}{self._ts(time_now)}{tail}{msg}'
+        self._window_write(log_msg)
         if is_save_to_log_file:
-            with open(self.log_filename, 'a') as logfile:
-                logfile.write(log_msg + '\n')
+            self._file_write(log_msg)
         return log_msg
 
+    # ======================================================================= #
+    # ======================================================================= #
+    def rx(self, msg, is_save_to_log_file=True, time_now=None):
+        """ To log a packet received from the PDU. "time_now" (as time.time())
+            is the time of reception, current time if not given.
+        """
+        return self._emit('PDU,', ',', msg, is_save_to_log_file, time_now)
+
     # ======================================================================= #
     # ======================================================================= #
     def tx(self, msg, is_save_to_log_file=True):
         """ To log a packet sent to the PDU
         """
-        log_msg = 'GND,' + datetime.utcnow().isoformat(sep=' ', timespec='milliseconds') + ',' + msg
-        window['-TMTCLOG-'].update(log_msg + '\n', append=True)
-        if is_save_to_log_file:
-            with open(self.log_filename, 'a') as logfile:
-                logfile.write(log_msg + '\n')
-        return log_msg
+        return self._emit('GND,', ',', msg, is_save_to_log_file)
+
+    # ======================================================================= #
+    # ======================================================================= #
+    def tx_many(self, msgs, is_save_to_log_file=True):
+        """ To log a burst of packets sent to the PDU, all with the same
+            timestamp, in a single update of the log window
+        """
+        time_now = time.time()
+        return [self._emit('GND,', ',', msg, is_save_to_log_file, time_now) for msg in msgs]
 
     # ======================================================================= #
     # ======================================================================= #
     def info(self, msg, is_save_to_log_file=True):
-        log_msg = 'GND,' + datetime.utcnow().isoformat(sep=' ', timespec='milliseconds') + ',INFO,' + msg
-        window['-TMTCLOG-'].update(log_msg + '\n', append=True)
-        if is_save_to_log_file:
-            with open(self.log_filename, 'a') as logfile:
-                logfile.write(log_msg + '\n')
-        return log_msg
+        return self._emit('GND,', ',INFO,', msg, is_save_to_log_file)
 
     # ======================================================================= #
     # ======================================================================= #
     def event(self, msg, is_save_to_log_file=True):
-        log_msg = 'GND,' + datetime.utcnow().isoformat(sep=' ', timespec='milliseconds') + ',EVENT,' + msg
-        window['-TMTCLOG-'].update(log_msg + '\n', append=True)
-        if is_save_to_log_file:
-            with open(self.log_filename, 'a') as logfile:
-                logfile.write(log_msg + '\n')
-        return log_msg
+        return self._emit('GND,', ',EVENT,', msg, is_save_to_log_file)
 
     # ======================================================================= #
     # ======================================================================= #
     def warning(self, msg, is_save_to_log_file=True):
-        log_msg = 'GND,' + datetime.utcnow().isoformat(sep=' ', timespec='milliseconds') + ',WARNING,' + msg
+        log_msg = self._emit('GND,', ',WARNING,', msg, is_save_to_log_file)
         print(log_msg)
-        window['-TMTCLOG-'].update(log_msg + '\n', append=True)
-        if is_save_to_log_file:
-            with open(self.log_filename, 'a') as logfile:
-                logfile.write(log_msg + '\n')
         return log_msg
 
     # ======================================================================= #
     # ======================================================================= #
     def debug(self, msg, is_save_to_log_file=False):
-        """ Will do something ONLY if global variable DEBUG == True. And then, does
-            the same as "info" but does not write to log file.
+        """ Will do something ONLY if global variable DEBUG == True (otherwise
+            it is replaced by a no-op in __init__). And then, does the same as
+            "info" but does not write to log file.
         """
-        if DEBUG:
-            log_msg = datetime.utcnow().isoformat(sep=' ', timespec='milliseconds') + ' - ' + msg
-            print(log_msg)
-            window['-TMTCLOG-'].update(log_msg + '\n', append=True)
-            if is_save_to_log_file:
-                with open(self.log_filename, 'a') as logfile:
-                    logfile.write(log_msg + '\n')
-            return log_msg
+        log_msg = self._emit('', ' - ', msg, is_save_to_log_file)
+        print(log_msg)
+        return log_msg
 
 
 # =========================================================================== #
@@ -617,23 +617,16 @@ class UserLogin:
         global serviceStatus
         serviceStatus = []
 
-        # list of the users
-        sectionList = parser.sections()
-
-        for index in range(len(sectionList)):
-            if usernameEntry.get() == sectionList[index]:
-                validLabel = tk.Label(self.master, text="Valid User")
-                validLabel.grid(row=3, padx=15, pady=10)
-                newlist = list(parser.items(sectionList[index]))
-
-                for control, servNum in enumerate(newlist):
-                    serviceStatus.append(servNum[1])
-                # user is valid
-                self.master.destroy()
-                break
-            elif usernameEntry.get() != sectionList[index]:
-                invalidLabel = tk.Label(self.master, text="Invalid Username", width=25)
-                invalidLabel.grid(row=3, padx=15, pady=10)
+        name = usernameEntry.get()  # Read from the entry only once
+        if parser.has_section(name):
+            validLabel = tk.Label(self.master, text="Valid User")
+            validLabel.grid(row=3, padx=15, pady=10)
+            serviceStatus.extend(value for _, value in parser.items(name))
+            # user is valid
+            self.master.destroy()
+        else:
+            invalidLabel = tk.Label(self.master, text="Invalid Username", width=25)
+            invalidLabel.grid(row=3, padx=15, pady=10)
 
     # print(serviceStatus)#DEBUG
 
@@ -27,11 +27,14 @@ import datetime
 import time
 import struct
 import sys
+import os
 import logging
+import logging.handlers
+import selectors
 import configparser
 from collections import OrderedDict
 from functools import partial
-from queue import Queue
+from queue import Queue, Empty, Full
 from socket import *
 
 # ========================================== #
@@ -43,16 +46,29 @@ CONFIG_FILE = 'settings.ini'  # Path of config file
 timestamp = time.strftime("%Y%m%d_%H%M%S")  # timestamp
 LOG_FILE = timestamp + ".txt"  # log filename = YearMonthDay_HourMinuteSecond
 USER_CONTROL = "userControl.ini"
+# Users read from USER_CONTROL, as a single (users, names) pair: user name ==>
+# status (ENABLE/DISABLE) of each service, and the set of the valid user names.
+# Read again only when the file was modified (see loadUsers).
+userCache = {'mtime': None, 'users': ({}, frozenset())}
+# Status (ENABLE/DISABLE) of each service for the user logged in. Filled in
+# place by UserLogin.checkUser, this list is never replaced.
+serviceStatus = []
 
 running = True
 
 GUI_THREAD_RATE = 500  # Thread loop rate, in milliseconds
-SEND_RECEIVE_RATE = 0.5  # Thread loop rate, in seconds
+LOG_BUFFER_RECORDS = 64  # Log records kept in memory before writing to file
+RECEIVE_BUFFER_SIZE = 1 << 20  # Socket receive buffer, in bytes
 WAKEUP_WAIT = 0.5  # Wait for ethernet device to wakeup, in seconds
 
 # TODO move queues out of global scope
-receiveQ = Queue(10)
-sendQ = Queue(10)
+QUEUE_SIZE = 1024  # Beyond that, the oldest messages are dropped (see putDropOldest)
+receiveQ = Queue(QUEUE_SIZE)
+sendQ = Queue(QUEUE_SIZE)
+droppedMessages = 0  # Count of messages dropped from the queues, reported by GUIThread
+# Written to (any byte) to wake up the SendReceiveThread, after putting a
+# command in sendQ or when the application ends.
+sendWakeReader, sendWakeWriter = socketpair()
 
 
 # =========================================================================== #
@@ -64,6 +80,7 @@ class GUIThread:
     # ======================================================================= #
     def __init__(self, master):
         self.counter = 0  # Counter for triggering auto refresh
+        self.droppedReported = 0  # droppedMessages already reported in the log
         # Read config file
         parser = configparser.ConfigParser()
         parser.read(CONFIG_FILE)
@@ -97,43 +114,66 @@ class GUIThread:
         self.sendReceiveThread = SendReceiveThread()
         self.sendReceiveThread.start()
 
+        # Received packet dispatch, by header
+        self.packetHandlers = {
+            "SRVCSET": self.onServiceSet,
+            "STATUS": self.onStatus,
+            "IPSET": self.onIpSet,
+            "PORTSET": self.onPortSet,
+            "Resetting": self.onResetting,
+        }
+
+    # ======================================================================= #
+    # Handlers of the received packets, they get the packet without header.   #
+    # ======================================================================= #
+    def onServiceSet(self, payload):
+        nb, value = payload.split(",", 2)[:2]
+        service = self.gui.servicesByNb[int(nb)]
+        service.setState(value)  # Update service state
+        self.gui.send(*service.statusCommand)
+
+    def onStatus(self, payload):
+        nb, value = payload.split(",", 2)[:2]
+        self.gui.servicesByNb[int(nb)].setStatus(value)
+
+    def onIpSet(self, payload):
+        ip = payload.replace(",", ".")
+        self.gui.setDestination(ip, self.gui.currentPort)
+
+    def onPortSet(self, payload):
+        self.gui.setDestination(self.gui.currentIP, payload.partition(",")[0])
+
+    def onResetting(self, payload):
+        self.gui.setDestination("192.168.1.177", "50000")
+        self.gui.settings[1].value = "192.168.1.177"
+        self.gui.updateSetting(self.gui.settings[1])
+        self.gui.settings[2].value = "50000"
+        self.gui.updateSetting(self.gui.settings[2])
+
     def run(self):
         """
         This method parses received messages, requests status updates,
         and redraws the GUI. These are run in a loop.
         """
-        if not receiveQ.empty():
-            rawPacket = receiveQ.get()  # Retrieve a message from the other thread
-            self.gui.logger.info("Received: " + rawPacket)
-
-            packet = rawPacket.split(",")
-            header = packet[0]  # Get message header
-            if header == "SRVCSET":  # Update service state
-                nb, value = packet[1], packet[2]
-                self.gui.services[int(nb) - 1].setState(value)
-                msg = "STATUS," + packet[1]
-                self.gui.send(msg)
-            elif header == "STATUS":
-                nb, value = packet[1], packet[2]
-                self.gui.services[int(nb) - 1].setStatus(value)
-            elif header == "IPSET":
-                ip = '.'.join(packet[1:])
-                self.gui.currentIP = ip
-            elif header == "PORTSET":
-                self.gui.currentPort = packet[1]
-            elif header == "Resetting":
-                self.gui.currentIP = "192.168.1.177"
-                self.gui.currentPort = "50000"
-                self.gui.settings[1].value = "192.168.1.177"
-                self.gui.updateSetting(self.gui.settings[1])
-                self.gui.settings[2].value = "50000"
-                self.gui.updateSetting(self.gui.settings[2])
-            else:
-                pass
+        while True:
+            try:
+                rawPacket = receiveQ.get_nowait()  # Retrieve a message from the other thread
+            except Empty:
+                break
+            self.gui.logger.info("Received: %s", rawPacket)
+
+            header, _, payload = rawPacket.partition(",")  # Get message header
+            handler = self.packetHandlers.get(header)
+            if handler:
+                handler(payload)
+
+        if droppedMessages != self.droppedReported:  # Reported once per loop, not per drop
+            self.gui.logger.warning("Queue overflow, %s messages dropped",
+                                    droppedMessages - self.droppedReported)
+            self.droppedReported = droppedMessages
 
         # Automatic status retrieval
-        # refreshRate = int(self.gui.getSetting('refresh_status')) * 60 * 1000
-        refreshRate = int(self.gui.getSetting('refresh_status')) * 1000
+        refreshRate = self.gui.refreshRate
         if refreshRate > 0:
             if self.counter >= refreshRate:
                 self.gui.refreshStatus()
@@ -141,14 +181,55 @@ class GUIThread:
             else:
                 self.counter += GUI_THREAD_RATE
 
-        # Check if GUI elements have been updated. If so, redraw them.
-        for service in self.gui.services:
-            if service.updated:
-                self.gui.updateService(service)
-                service.updated = False
+        # Redraw the GUI elements that have been updated, if any.
+        while self.gui.updatedServices:
+            service = self.gui.updatedServices.pop()
+            self.gui.updateService(service)
+            service.updated = False
+        self.gui.textHandler.showPending()  # Show what was logged since last loop
+        self.gui.fileLogHandler.flush()  # Write the buffered log records
         self.gui.master.after(GUI_THREAD_RATE, self.run)  # Loop this method
 
 
+# =========================================================================== #
+# Put an item in a queue without blocking. When it is full, the oldest item   #
+# is dropped to make room and counted in droppedMessages.                     #
+# =========================================================================== #
+def putDropOldest(q, item):
+    global droppedMessages
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except Full:
+            try:
+                q.get_nowait()
+                droppedMessages += 1
+            except Empty:
+                pass
+
+
+# =========================================================================== #
+# Get the users from USER_CONTROL as a (users, names) pair: a dictionary user #
+# name ==> list of the status of each service, and the frozenset of the user  #
+# names. Both always come from the same parse, which is done again only if    #
+# the file was modified.                                                      #
+# =========================================================================== #
+def loadUsers():
+    try:
+        mtime = os.stat(USER_CONTROL).st_mtime
+    except OSError:  # No file, no user
+        mtime = None
+    if mtime != userCache['mtime'] or mtime is None:
+        parser = configparser.ConfigParser()
+        parser.read(USER_CONTROL)
+        users = {section: [value for _, value in parser.items(section)]
+                 for section in parser.sections()}
+        userCache['users'] = (users, frozenset(users))  # Replaced as one, never half updated
+        userCache['mtime'] = mtime
+    return userCache['users']
+
+
 # =========================================================================== #
 # Thread to receive and send messages through UDP socket.                     #
 # =========================================================================== #
@@ -159,33 +240,62 @@ class SendReceiveThread(threading.Thread):
     def __init__(self):
         threading.Thread.__init__(self)
         self.sock = socket(AF_INET, SOCK_DGRAM)
-        self.sock.settimeout(1)
+        self.sock.setblocking(False)
+        # Larger receive buffer, so that a burst is not dropped by the kernel
+        self.sock.setsockopt(SOL_SOCKET, SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+        # Bound right away (any port) rather than by the first sendto, since
+        # Windows refuses to receive on an unbound socket.
+        self.sock.bind(('', 0))
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.selector.register(sendWakeReader, selectors.EVENT_READ)
 
     # ======================================================================= #
-    # Send a command to the destination. dest must be in the form of          #
-    # (IP address, port).                                                     #
+    # Send a command (already encoded, bytes) to the destination. dest must   #
+    # be in the form of (IP address, port). A failure (i.e. a bad address     #
+    # typed in the GUI) is logged, the following commands are still sent.    #
     # ======================================================================= #
     def send(self, command, dest):
-        self.sock.sendto(command.encode(), dest)
+        try:
+            self.sock.sendto(command, dest)
+        except OSError as error:
+            logging.getLogger().error("Could not send %s to %s: %s", command, dest, error)
 
     # ======================================================================= #
-    # Run this thread. This is called when Thread.start() is called.          #
+    # Run this thread. This is called when Thread.start() is called. Sleeps   #
+    # until a packet is received or a command is to be sent (see sendWake*).  #
     # ======================================================================= #
     def run(self):
         while running:
-            if not sendQ.empty():
-                # Expect to get command, destintion, and MAC address from the queue
-                command, dest, mac = sendQ.get()
-                self.send(command, dest)
-
-            time.sleep(SEND_RECEIVE_RATE)  # Allow time for a response
-
-            try:
-                # Receive packet and place data in queue
-                data, addr = self.sock.recvfrom(2048)
-                receiveQ.put(data.decode())
-            except:  # TODO catch timeout specifically
-                pass
+            for key, events in self.selector.select():
+                if key.fileobj is sendWakeReader:
+                    sendWakeReader.recv(1024)  # Only to wake us up, discard
+                    # Send everything queued, one datagram after the other
+                    while True:
+                        try:
+                            # Expect to get command, destintion, and MAC address from the queue
+                            command, dest, mac = sendQ.get_nowait()
+                        except Empty:
+                            break
+                        self.send(command, dest)
+                else:
+                    # Receive all the packets waiting and place them in queue
+                    while True:
+                        try:
+                            data, addr = self.sock.recvfrom(2048)
+                        except BlockingIOError:  # Nothing more for now
+                            break
+                        except ConnectionResetError:  # ICMP error reported on Windows
+                            continue
+                        except OSError as error:
+                            # Would be reported again at each select(): stop
+                            # receiving, but keep sending.
+                            logging.getLogger().error(
+                                "Receive failed, no longer receiving: %s", error)
+                            self.selector.unregister(self.sock)
+                            break
+                        # Never fails, a byte that is not ASCII shows as a replacement character
+                        putDropOldest(receiveQ, data.decode('ascii', 'replace'))
 
 
 # =========================================================================== #
@@ -202,21 +312,31 @@ class Service:
         self.status = "0.000"
         self.state = 0  # Initial state is 0, or off
         self.updated = False  # Whether the GUI element requires an update
+        self.updatedSet = None  # If set, the service adds itself to it when updated (see GUI.updatedServices)
         self.serviceButton = self.serviceLabel = self.serviceIndicator = self.statusIndicator = self.refreshButton = None
+        # Commands for this service, as (text, datagram) pairs. They never change,
+        # so they are built and encoded only once, here.
+        self.statusCommand = self.makeCommand(f"STATUS,{nb}")
+        self.onCommand = self.makeCommand(f"SETSRVC,{nb},1")
+        self.offCommand = self.makeCommand(f"SETSRVC,{nb},0")
+
+    @staticmethod
+    def makeCommand(text):
+        return text, text.encode('ascii')
 
     # ======================================================================= #
     # Update the state of this service.                                       #
     # ======================================================================= #
     def setState(self, state):
         self.state = int(state)
-        self.updated = True
+        self.setUpdated()
 
     # ======================================================================= #
     # Update the status of this service.                                      #
     # ======================================================================= #
     def setStatus(self, status):
         self.status = status
-        self.updated = True
+        self.setUpdated()
 
     # ======================================================================= #
     # Update the label of the service                                         #
@@ -224,7 +344,15 @@ class Service:
     def setLabel(self, label):
         self.label = label
         # print(label)
+        self.setUpdated()
+
+    # ======================================================================= #
+    # Flag that the GUI element requires an update.                           #
+    # ======================================================================= #
+    def setUpdated(self):
         self.updated = True
+        if self.updatedSet is not None:
+            self.updatedSet.add(self)
 
 
 # =========================================================================== #
@@ -241,7 +369,9 @@ class Setting:
         self.label = label
         self.value = value
         self.updated = False  # Whether the setting has been updated
-        self.settingButton = self.settingValue = None
+        self.settingButton = self.settingValue = None  # Widgets currently shown
+        self.valueLabel = self.editButton = None
+        self.valueEntry = self.saveButton = None
         Setting.nb += 1
         self.nb = Setting.nb
 
@@ -260,19 +390,31 @@ class GUI:
         # ===============================================================
         self.master = master
         self.services = services
+        self.servicesByNb = {service.nb: service for service in services}
+        self.updatedServices = set()  # Services to redraw, see GUIThread.run
+        for service in services:
+            service.updatedSet = self.updatedServices
         self.settings = settings
+        self.settingsByKey = {setting.key: setting for setting in settings}
         self.devices = devices
-        self.currentIP = "192.168.1.177"
-        self.currentPort = "50000"
+        self.setDestination("192.168.1.177", "50000")
+        self.deviceMac = self.devices.get(self.getSetting('device'))
+        self.setRefreshRate(self.getSetting('refresh_status'))
 
         master.title("STRATOS Power Distribution Unit Service Control")
         master.config(background="#FFFFFF")
         master.protocol("WM_DELETE_WINDOW", self.endApplication)
 
-        # Configure default logger. Outputs to console.
-        logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
-                            format='%(asctime)s - %(message)s')
+        # Configure default logger. Outputs to the log file, records are
+        # buffered and written in batches (see GUIThread.run for the periodic
+        # flush; logging flushes it at exit).
+        fileHandler = logging.FileHandler(LOG_FILE)
+        fileHandler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+        self.fileLogHandler = logging.handlers.MemoryHandler(
+            LOG_BUFFER_RECORDS, flushLevel=logging.ERROR, target=fileHandler)
         self.logger = logging.getLogger()
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.fileLogHandler)
 
         # Settings Frame
         self.settingsFrame = tk.LabelFrame(
@@ -294,6 +436,7 @@ class GUI:
                     self.currentPort = setting.value
 
                 self.updateSetting(setting)
+        self.setDestination(self.currentIP, self.currentPort)
 
         resetButton = tk.Button(
             self.settingsFrame, text="Reset", width=4, command=partial(self.reset))
@@ -340,20 +483,16 @@ class GUI:
         logBox.grid(row=1, column=0, sticky="nsew")
 
         # Attach handler to display logs in log box
-        self.logger.addHandler(TextHandler(logBox))
+        self.textHandler = TextHandler(logBox)
+        self.logger.addHandler(self.textHandler)
 
     def updateSetting(self, setting, editMode=False):
         """
-		Update the GUI elements related to the settings
+		Update the GUI elements related to the settings. Both the view and the
+		edit widgets are created only once; only the pair matching the mode is
+		shown, the other one is hidden.
 		"""
-        # Destroy existing GUI elements
-        if setting.settingValue:
-            setting.settingValue.destroy()
-        if setting.settingButton:
-            setting.settingButton.destroy()
-
-        if editMode:
-
+        if setting.valueLabel is None:
             # if setting.key == 'device':  # Device setting uses Combobox widget
             #	deviceList = list(self.devices.keys())
             #	setting.settingValue = tk.ttk.Combobox(
@@ -361,15 +500,29 @@ class GUI:
             #	setting.settingValue.current(deviceList.index(setting.value))
             #	setting.settingValue.configure(state="readonly")
             # else:  # Other settings use Entry widget
-            setting.settingValue = tk.Entry(self.settingsFrame, width=12)
-            setting.settingValue.insert(0, setting.value)
-            setting.settingButton = tk.Button(
+            setting.valueEntry = tk.Entry(self.settingsFrame, width=12)
+            setting.saveButton = tk.Button(
                 self.settingsFrame, text="Save", width=4, command=partial(self.saveSetting, setting))
-        else:
-            setting.settingValue = tk.Label(
+            setting.valueLabel = tk.Label(
                 self.settingsFrame, text=setting.value, width=15, anchor="center")
-            setting.settingButton = tk.Button(
+            setting.editButton = tk.Button(
                 self.settingsFrame, text="Edit", width=4, command=partial(self.updateSetting, setting, True))
+
+        # Hide the widgets currently shown
+        if setting.settingValue:
+            setting.settingValue.grid_remove()
+        if setting.settingButton:
+            setting.settingButton.grid_remove()
+
+        if editMode:
+            setting.valueEntry.delete(0, tk.END)
+            setting.valueEntry.insert(0, setting.value)
+            setting.settingValue = setting.valueEntry
+            setting.settingButton = setting.saveButton
+        else:
+            setting.valueLabel.configure(text=setting.value)
+            setting.settingValue = setting.valueLabel
+            setting.settingButton = setting.editButton
         setting.settingValue.grid(row=(setting.nb - 1), column=1, padx=5, pady=5)
         setting.settingButton.grid(
             row=(setting.nb - 1), column=2, padx=(0, 10), pady=16)
@@ -379,12 +532,19 @@ class GUI:
 		Save setting values after editing.
 		"""
         setting.value = setting.settingValue.get()
-        if setting.key == "ip":
-            msg = "SETIP," + setting.value
+        if setting.key == "device":
+            self.deviceMac = self.devices.get(setting.value)
+        elif setting.key == "ip":
+            msg = f"SETIP,{setting.value}"
             self.send(msg)
         elif setting.key == "port":
-            msg = "SETPORT," + setting.value
+            msg = f"SETPORT,{setting.value}"
             self.send(msg)
+        elif setting.key == "refresh_status":
+            try:
+                self.setRefreshRate(setting.value)
+            except ValueError:
+                self.logger.warning("Invalid auto refresh period: %s", setting.value)
         self.updateSetting(setting)
 
     def updateLabel(self, service):
@@ -418,19 +578,15 @@ class GUI:
 
     def updateService(self, service):
         """
-		Update the GUI elements of a service.
+		Update the GUI elements of a service. The widgets are created the first
+		time only, afterward only the values that change are configured.
 		"""
-        # Destroy existing elements
-        if service.serviceButton:
-            service.serviceButton.destroy()
-        if service.serviceIndicator:
-            service.serviceIndicator.destroy()
-        if service.statusIndicator:
-            service.statusIndicator.destroy()
-        if service.refreshButton:
-            service.serviceButton.destroy()
-        if service.serviceLabel:
-            service.serviceLabel.destroy()
+        if service.serviceLabel is not None:
+            service.serviceLabel.configure(text=service.label)
+            service.serviceIndicator.configure(
+                bg="green" if service.state else "red")
+            service.statusIndicator.configure(text=service.status)
+            return
 
         service.serviceLabel = tk.Label(
             self.servicesFrame, text=service.label, width=40)
@@ -470,19 +626,30 @@ class GUI:
 		Activate or deactivate a service
 		"""
         print("set service state")
-        msg = "SETSRVC," + str(service.nb) + "," + \
-              ("0" if service.state else "1")
-        self.send(msg)
+        self.send(*(service.offCommand if service.state else service.onCommand))
+
+    def setDestination(self, ip, port):
+        """
+		Set the IP address and port the commands are sent to
+		"""
+        self.currentIP = ip
+        self.currentPort = port
+        self.dest = (ip, int(port))  # Built once, used for every command sent
+
+    def setRefreshRate(self, seconds):
+        """
+		Set the automatic status refresh period, given in seconds (as text).
+		Kept in milliseconds, parsed only when the setting changes.
+		"""
+        # self.refreshRate = int(seconds) * 60 * 1000
+        self.refreshRate = int(seconds) * 1000
 
     def getSetting(self, key):
         """
 		Get a setting object based on its key
 		"""
-        # TODO find a more efficient way to get a setting
-        for setting in self.settings:
-            if setting.key == key:
-                return setting.value
-        return None
+        setting = self.settingsByKey.get(key)
+        return setting.value if setting else None
 
     def refreshStatus(self):
         """
@@ -492,15 +659,13 @@ class GUI:
             if serviceStatus[service.nb - 1] == "DISABLE":
                 pass
             else:
-                msg = "STATUS," + str(service.nb)
-                self.send(msg)
+                self.send(*service.statusCommand)
 
     def refreshSingleStatus(self, service):
         """
 		Get the status of 1 service.
 		"""
-        msg = "STATUS," + str(service.nb)
-        self.send(msg)
+        self.send(*service.statusCommand)
 
     def reset(self):
         """
@@ -515,14 +680,17 @@ class GUI:
         else:
             pass
 
-    def send(self, command):
+    def send(self, command, data=None):
         """
-		Put a message, its destination, and the destination MAC in the queue
+		Put a message, its destination, and the destination MAC in the queue.
+		The message is encoded here (unless given already encoded as data), so
+		the network thread sends it as is.
 		"""
-        # dest = (self.getSetting('ip'), int(self.getSetting('port')))
-        dest = (self.currentIP, int(self.currentPort))
-        sendQ.put((command, dest, self.devices[self.getSetting('device')]))
-        self.logger.info("Sending: " + command)
+        if data is None:
+            data = command.encode('ascii')
+        putDropOldest(sendQ, (data, self.dest, self.deviceMac))
+        sendWakeWriter.send(b'x')
+        self.logger.info("Sending: %s", command)
 
     def endApplication(self):
         """
@@ -530,6 +698,7 @@ class GUI:
 		"""
         global running
         running = False  # Stop child threads
+        sendWakeWriter.send(b'x')
         parser = configparser.ConfigParser()
 
         settings = OrderedDict()
@@ -566,13 +735,28 @@ class TextHandler(logging.Handler):
         self.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
         self.setLevel(logging.INFO)
         self.text = text
+        self.pending = []  # Messages not yet shown, see showPending()
+        self.pendingLock = threading.Lock()
 
+    # ======================================================================= #
+    # Only queue the message, the text box is updated by showPending(), on    #
+    # each GUIThread loop, with all the messages received in between.         #
+    # ======================================================================= #
     def emit(self, record):
         msg = self.format(record)
-        self.text.configure(state='normal')
-        self.text.insert(tk.END, msg + '\n')
-        self.text.see(tk.END)  # Scroll to end of textbox
-        self.text.configure(state='disabled')
+        with self.pendingLock:
+            self.pending.append(msg + '\n')
+
+    # ======================================================================= #
+    # ======================================================================= #
+    def showPending(self):
+        with self.pendingLock:
+            pending, self.pending = self.pending, []
+        if pending:
+            self.text.configure(state='normal')
+            self.text.insert(tk.END, ''.join(pending))
+            self.text.see(tk.END)  # Scroll to end of textbox
+            self.text.configure(state='disabled')
 
 
 # =========================================================================== #
@@ -600,36 +784,27 @@ class UserLogin:
                               width=10, anchor="center", command=self.checkUser)
         # logButton.bind("<Return>", lambda event: self.checkUser())
         logButton.grid(row=2, padx=15, pady=15)
+        self.invalidLabel = None  # Created at the first invalid attempt, then kept
+
+        # Read the users while the login screen is shown, so that the file is
+        # already parsed (cached) when checkUser needs it. No Tk call is made
+        # from that thread.
+        threading.Thread(target=loadUsers, daemon=True).start()
 
     # ======================================================================= #
     # Validate users                                                          #
     # ======================================================================= #
     def checkUser(self):
 
-        parser = configparser.ConfigParser()
-        parser.read(USER_CONTROL)
-
-        # contains the satus (EN/DIS) of a service
-        global serviceStatus
-        serviceStatus = []
-
-        # list of the users
-        sectionList = parser.sections()
-
-        for index in range(len(sectionList)):
-            if usernameEntry.get() == sectionList[index]:
-                validLabel = tk.Label(self.master, text="Valid User")
-                validLabel.grid(row=3, padx=15, pady=10)
-                newlist = list(parser.items(sectionList[index]))
-
-                for control, servNum in enumerate(newlist):
-                    serviceStatus.append(servNum[1])
-                # user is valid
-                self.master.destroy()
-                break
-            elif usernameEntry.get() != sectionList[index]:
-                invalidLabel = tk.Label(self.master, text="Invalid Username", width=25)
-                invalidLabel.grid(row=3, padx=15, pady=10)
+        users, names = loadUsers()  # Only a stat, unless the file was modified since
+        name = usernameEntry.get()
+        if name in names:
+            serviceStatus[:] = users[name]
+            # user is valid
+            self.master.destroy()
+        elif self.invalidLabel is None:
+            self.invalidLabel = tk.Label(self.master, text="Invalid Username", width=25)
+            self.invalidLabel.grid(row=3, padx=15, pady=10)
 
     # print(serviceStatus)#DEBUG
 
@@ -1,59 +1,167 @@
+import logging
+import os
+import selectors
 import socket
-import time
+import threading
 from random import uniform
 
-from socket import *
+DEBUG = False   # True to trace every packet received and sent
+log = logging.getLogger(__name__)
+# ------------------------------------------------------------------ #
+# With SO_REUSEPORT (not on Windows), several sockets are bound to   #
+# the rx port, each served by its own thread, and the kernel spreads #
+# the packets among them. Otherwise, a single socket is used.        #
+# ------------------------------------------------------------------ #
+IS_REUSEPORT = hasattr(socket, 'SO_REUSEPORT')
+WORKERS = (os.cpu_count() or 1) if IS_REUSEPORT else 1
+SOCKET_BUFFER_SIZE = 8 * 1024 * 1024    # Receive and send buffers, so bursts are not dropped
+# ------------------------------------------------------------------ #
+# The packets are ASCII CSV, as sent and expected by the PDU itself  #
+# (and parsed by PDUController). It is not for the simulator to      #
+# change the wire format, so they are not packed with struct.        #
+# Responses, or their first field, already encoded:                  #
+# ------------------------------------------------------------------ #
+_SRVCSET = b'SRVCSET'
+_IPSET = b'IPSET'
+_PORTSET = b'PORTSET'
+_RESETTING = b'Resetting'
+_CMDERROR = b'CMDERROR'
+
+# ########################################################################### #
+# The simulated PDU: answers each command received on "sock" as the PDU       #
+# would. The responses are sent with the same socket.                         #
+# ########################################################################### #
+class SimPDU:
+    def __init__(self, sock, tx_port, is_on):
+        self.sock = sock
+        self.tx_addr = (socket.gethostbyname('localhost'), tx_port)    # Resolved only once
+        self.is_on = is_on                                      # Shared by all workers
+        self.recv_buffer = bytearray(2048)                      # Every packet is received in it
+        self.recv_view = memoryview(self.recv_buffer)
+        # ---------------------------------------------------------- #
+        # Command ==> handler, which returns the response. Commands  #
+        # and responses are kept as bytes, never decoded/encoded.    #
+        # ---------------------------------------------------------- #
+        self.handlers = {
+            b'SETSRVC': self.on_setsrvc,
+            b'STATUS': self.on_status,
+            b'SETIP': self.on_setip,
+            b'SETPORT': self.on_setport,
+            b'RESET': self.on_reset,
+        }
+
+    # ---------------------------------------------------------- #
+    # The handlers get what follows the command (and its comma)  #
+    # and split only the fields they need. Each returns its      #
+    # response as one bytes object, built in a single step (the  #
+    # constant ones are never rebuilt), sent as is.              #
+    # ---------------------------------------------------------- #
+    def service_index(self, service):
+        """ Index in is_on of a service number (1 to 6). Raises IndexError
+            for a number out of range, ValueError if it is not a number.
+        """
+        service_index = int(service) - 1
+        if not 0 <= service_index < len(self.is_on):
+            raise IndexError(f'no service {service_index + 1}')
+        return service_index
+
+    def on_setsrvc(self, fields):
+        service, state = fields.split(b',', 2)[:2]
+        self.is_on[self.service_index(service)] = state
+        return b','.join((_SRVCSET, service, state))
+
+    def on_status(self, fields):
+        service = fields.split(b',', 1)[0]
+        service_index = self.service_index(service)
+        if service_index == 5:
+            value = -0.12
+        else:
+            value = uniform(0.5, 1.0)
+        return b'STATUS,%s,%s,%.3f' % (service, self.is_on[service_index], value)
+
+    def on_setip(self, fields):
+        ip_1, ip_2, ip_3, ip_4 = fields.split(b',', 4)[:4]
+        return b','.join((_IPSET, ip_1, ip_2, ip_3, ip_4))
+
+    def on_setport(self, fields):
+        port = fields.split(b',', 1)[0]
+        if not port:
+            raise ValueError('no port')
+        return b','.join((_PORTSET, port))
+
+    def on_reset(self, fields):
+        return _RESETTING
+
+    def on_unknown(self, fields):
+        return _CMDERROR
+
+    def packet_received(self, data, addr):
+        """ Answers one packet received (see read_ready)
+        """
+        log.debug('RX: %s', data)
+        command, _, fields = data.partition(b',')
+        try:
+            return_packet = self.handlers.get(command, self.on_unknown)(fields)
+        except (IndexError, ValueError) as error:
+            # Malformed packet (missing fields or bad service number)
+            log.warning('ERROR: %r in %s', error, data)
+            return_packet = _CMDERROR
+        log.debug('TX: %s', return_packet)
+        self.sock.sendto(return_packet, self.tx_addr)
+
+    def read_ready(self, sock):
+        """ Called by the selector loop (see run_worker) when the socket is
+            readable: handles all the packets waiting, not only the first one
+        """
+        recv_buffer = self.recv_buffer
+        recv_view = self.recv_view
+        while True:
+            try:
+                nbytes, addr = sock.recvfrom_into(recv_buffer)
+            except BlockingIOError:
+                return          # Nothing more for now
+            except ConnectionResetError:
+                continue        # i.e. ICMP error reported on Windows for a previous packet
+            self.packet_received(bytes(recv_view[:nbytes]), addr)
+
+
+def run_worker(rx_port, tx_port, is_on):
+    """ Serve the packets received by one socket bound to the rx port, until
+        the application ends
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if IS_REUSEPORT:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(('localhost', rx_port))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    sock.setblocking(False)
+    pdu = SimPDU(sock, tx_port, is_on)
+    # ---------------------------------------------------------- #
+    # More sockets can be registered here, each with the method  #
+    # to call when it is readable.                               #
+    # ---------------------------------------------------------- #
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ, pdu.read_ready)
+    try:
+        while True:
+            for key, _ in selector.select():    # Sleeps until a packet is received
+                key.data(key.fileobj)
+    finally:
+        selector.close()
+        sock.close()
+
 
 def main():
     rx_port = 10001
     tx_port = 10002
-    is_on = ['0', '0', '0', '0', '0', '0']
-    print(f"STARTING simPDU with rx port = {rx_port} and txt port = {tx_port}")
-    sock = socket(AF_INET, SOCK_DGRAM)
-    sock.bind(('localhost', rx_port))
-    sock.settimeout(0.01)  # Timeout of 10ms
+    is_on = [b'0', b'0', b'0', b'0', b'0', b'0']
+    logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO, format='%(message)s')
+    print(f"STARTING simPDU with rx port = {rx_port} and txt port = {tx_port}, {WORKERS} worker(s)")
+    for _ in range(WORKERS - 1):
+        threading.Thread(target=run_worker, args=(rx_port, tx_port, is_on), daemon=True).start()
     print("Pret a recevoir les paquets")
-    while True:
-        try:
-            data, addr = sock.recvfrom(2048)  # Will not block, timeout = 10ms
-            raw_packet = data.decode()
-            print('RX: ' + raw_packet)
-            element = raw_packet.split(',')
-            print(len(element))
-            if element[0] == 'SETSRVC':
-                service_index = int(element[1]) - 1
-                is_on[service_index] = element[2]
-                return_packet = f'SRVCSET,{element[1]},{element[2]}'
-                print('TX: '+return_packet)
-                sock.sendto(return_packet.encode(), ('localhost', tx_port))
-            elif element[0] == 'STATUS':
-                service_index = int(element[1]) - 1
-                if service_index == 5:
-                    value = -0.12
-                else:
-                    value = uniform(0.5, 1.0)
-                return_packet = f'STATUS,{element[1]},{is_on[service_index]},{value:.3f}'
-                print('TX: '+return_packet)
-                sock.sendto(return_packet.encode(), ('localhost', tx_port))
-            elif element[0] == 'SETIP':
-                return_packet = f'IPSET,{element[1]},{element[2]},{element[3]},{element[4]}'
-                print('TX: '+return_packet)
-                sock.sendto(return_packet.encode(), ('localhost', tx_port))
-            elif element[0] == 'SETPORT':
-                return_packet = f'PORTSET,{element[1]}'
-                print('TX: ' + return_packet)
-                sock.sendto(return_packet.encode(), ('localhost', tx_port))
-            elif element[0] == 'RESET':
-                return_packet = 'Resetting'
-                print('TX: '+return_packet)
-                sock.sendto(return_packet.encode(), ('localhost', tx_port))
-            else:
-                return_packet = 'CMDERROR'
-                print('TX: '+return_packet)
-                sock.sendto(return_packet.encode(), ('localhost', tx_port))
-        except:
-            pass
-        time.sleep(0.1)
+    run_worker(rx_port, tx_port, is_on)
 
 
 # ########################################################################### #